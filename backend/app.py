@@ -3,16 +3,28 @@ from flask_cors import CORS
 from modules.pipeline import Pipeline
 from modules.data_generator import DataGenerator
 from modules.model_trainer import ModelTrainer
+from modules.incremental_trainer import IncrementalTrainer
 from modules.performance_auditor import PerformanceAuditor
+from modules.dataset_catalog import DatasetCatalog
+from modules.drift_monitor import DriftMonitor
 import time
+import os
 
 app = Flask(__name__)
 CORS(app)  
 
-pipeline = Pipeline()
+# Under gunicorn.conf.py the app is preloaded once and workers share the model
+# and challengers. Shadow results are merged across workers; history and drift
+# sketches stay per worker process.
+pipeline = Pipeline(version=os.environ.get('SECUREBANK_MODEL'),
+                    shared=os.environ.get('SECUREBANK_SERVING_MODE') == 'shared')
 data_generator = DataGenerator()
 model_trainer = ModelTrainer()
+incremental_trainer = IncrementalTrainer()
 performance_auditor = PerformanceAuditor()
+dataset_catalog = DatasetCatalog()
+drift_monitor = DriftMonitor()
+drift_monitor.extract()
 
 @app.route('/predict/', methods=['POST'])
 def predict():
@@ -25,8 +37,14 @@ def predict():
     if not all(key in data for key in required_keys):
         return jsonify({"error": "Missing required fields"}), 400
     try:
-        prediction = pipeline.predict(data)
-        return jsonify({"prediction": "fraud" if prediction else "legitimate"})
+        prediction, score = pipeline.predict_with_score(data)
+        drift_monitor.use_reference(pipeline.training_data_version())
+        drift_monitor.update(data)
+        return jsonify({
+            "prediction": "fraud" if prediction else "legitimate",
+            "score": score,
+            "threshold": pipeline.threshold
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -52,15 +70,32 @@ def train_model():
     data = request.json
     model_name = data.get('model_name')
     dataset_version = data.get('dataset_version')
+    target_fpr = data.get('target_fpr', 0.01)
 
     if not model_name or not dataset_version:
         return jsonify({"error": "Missing model name or dataset version"}), 400
     try:
-        model_trainer.train(model_name, dataset_version)
+        model_trainer.train(model_name, dataset_version, target_fpr=target_fpr)
         return jsonify({"message": f"Model {model_name} trained successfully on dataset {dataset_version}"})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/retrain_model/', methods=['POST'])
+def retrain_model():
+    data = request.json
+    model_name = data.get('model_name')
+    dataset_version = data.get('dataset_version')
+
+    if not model_name or not dataset_version:
+        return jsonify({"error": "Missing model name or dataset version"}), 400
+    try:
+        results = incremental_trainer.retrain(model_name, dataset_version)
+        new_model_name = next(iter(results))
+        return jsonify({"message": f"Model {model_name} updated as {new_model_name} from dataset {dataset_version}",
+                        "results": results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/select_model/', methods=['POST'])
 def select_model():
     data = request.json
@@ -73,6 +108,34 @@ def select_model():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/add_challenger/', methods=['POST'])
+def add_challenger():
+    data = request.json
+    model_name = data.get('model_name')
+    if not model_name:
+        return jsonify({"error": "Missing model name"}), 400
+    try:
+        pipeline.add_challenger(model_name)
+        return jsonify({"message": f"Model {model_name} is now shadow scoring"})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/remove_challenger/', methods=['POST'])
+def remove_challenger():
+    data = request.json
+    model_name = data.get('model_name')
+    if not model_name:
+        return jsonify({"error": "Missing model name"}), 400
+    try:
+        pipeline.remove_challenger(model_name)
+        return jsonify({"message": f"Model {model_name} removed from shadow scoring"})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/shadow', methods=['GET'])
+def get_shadow():
+    return jsonify(pipeline.shadow_report())
+
 @app.route('/history', methods=['GET'])
 def get_history():
     history = pipeline.get_history()
@@ -83,21 +146,64 @@ def get_history():
 def audit_performance():
     data = request.json
     dataset_version = data.get('dataset_version')
+    target_fpr = data.get('target_fpr')
 
     if not dataset_version:
         return jsonify({"error": "Missing dataset version"}), 400
 
     try:
-        performance_metrics = performance_auditor.audit(pipeline, dataset_version)
+        performance_metrics = performance_auditor.audit(pipeline, dataset_version, target_fpr=target_fpr)
         return jsonify(performance_metrics)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/audit_shadow/', methods=['POST'])
+def audit_shadow():
+    data = request.json
+    labeled_transactions = data.get('labels')
+
+    if not labeled_transactions:
+        return jsonify({"error": "Missing labels"}), 400
+
+    try:
+        labels = {pipeline.transaction_key(item['transaction']): item['is_fraud'] for item in labeled_transactions}
+        comparison = performance_auditor.compare_models(pipeline.shadow_records(), labels)
+        return jsonify(comparison)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/tune_threshold/', methods=['POST'])
+def tune_threshold():
+    data = request.json
+    dataset_version = data.get('dataset_version')
+    target_fpr = data.get('target_fpr')
+
+    if not dataset_version or target_fpr is None:
+        return jsonify({"error": "Missing dataset version or target FPR"}), 400
+
+    try:
+        performance_metrics = performance_auditor.audit(pipeline, dataset_version, target_fpr=target_fpr)
+        pipeline.save_threshold(performance_metrics['operating_point'], performance_metrics['version'])
+        return jsonify(performance_metrics['operating_point'])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/drift', methods=['GET'])
+def get_drift():
+    return jsonify(drift_monitor.report())
+
 @app.route('/datasets', methods=['GET'])
 def get_datasets():
-    datasets = ['v1.0', 'v1.1', 'v2.0']
+    datasets = dataset_catalog.list_versions()
     return jsonify(datasets)
 
+@app.route('/datasets/<version>', methods=['GET'])
+def get_dataset(version):
+    manifest = dataset_catalog.get(version)
+    if manifest is None:
+        return jsonify({"error": f"Unknown dataset version {version}"}), 404
+    return jsonify(manifest)
+
 @app.route('/models', methods=['GET'])
 def get_models():
     models = ['logistic_regression', 'rvm', 'random_forest']
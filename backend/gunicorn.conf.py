@@ -0,0 +1,16 @@
+import gc
+import os
+
+# Shared serving mode: the master imports app.py once (running the ETL and
+# loading the model named by SECUREBANK_MODEL, or the last selected one),
+# then forks workers that attach to the same memory-mapped tables
+os.environ['SECUREBANK_SERVING_MODE'] = 'shared'
+
+bind = '0.0.0.0:5001'
+workers = int(os.environ.get('SECUREBANK_WORKERS', 4))
+preload_app = True
+
+def pre_fork(server, worker):
+    # Keep the garbage collector from touching preloaded objects, which would
+    # otherwise copy their pages into every worker
+    gc.freeze()
@@ -1,6 +1,7 @@
 from modules.raw_data_handler import Raw_Data_Handler
 from modules.dataset_design import Dataset_Designer
 from modules.feature_extractor import Feature_Extractor
+from modules.dataset_catalog import DatasetCatalog, DEFAULT_VERSION
 
 import pandas as pd
 import json
@@ -11,26 +12,20 @@ import os
 
 class DataGenerator:
     def __init__(self):
-        self.data_sources = {
-            'customers': 'data_sources/customer_release.csv',
-            'transactions': 'data_sources/transactions_release.parquet',
-            'fraud': 'data_sources/fraud_release.json'
-        }
+        self.catalog = DatasetCatalog()
         self.customers_df = None
         self.transactions_df = None
         self.fraud_df = None
 
     def load_data(self, version: str = None):
-        # Create paths using the version string
-        customer_path = self.construct_path('customers', version)
-        transactions_path = self.construct_path('transactions', version)
-        fraud_path = self.construct_path('fraud', version)
+        # Look up the source files for this version in the catalog
+        paths = self.catalog.source_paths(version)
 
         # Load the data
-        self.customers_df = pd.read_csv(customer_path)
-        self.transactions_df = pd.read_parquet(transactions_path)
+        self.customers_df = pd.read_csv(paths['customers'])
+        self.transactions_df = pd.read_parquet(paths['transactions'])
         
-        with open(fraud_path, 'r') as f:
+        with open(paths['fraud'], 'r') as f:
             fraud_data = json.load(f)
 
         if isinstance(fraud_data, dict):  
@@ -39,15 +34,6 @@ class DataGenerator:
 
         return [self.customers_df, self.transactions_df, self.fraud_df]
     
-    def construct_path(self, source_key: str, version: str) -> str:
-        default_path = self.data_sources[source_key]
-        if version:
-            # Extract the base name and file extension from the default path
-            base_name, extension = default_path.rsplit('.', 1)
-            # Construct the path using the version
-            return f"{base_name}_{version}.{extension}"
-        return default_path
-
     def generate_new_customers(self, num_customers: int) -> pd.DataFrame:
         new_customers = self.customers_df.sample(n=num_customers, replace=True).reset_index(drop=True)
         new_customers['cc_num'] = np.random.randint(1000000000000000, 9999999999999999, size=num_customers)
@@ -100,11 +86,21 @@ class DataGenerator:
 
         if not version:
             version = 'v1.1'
+        if version == DEFAULT_VERSION:
+            raise ValueError(f"Version {DEFAULT_VERSION} is reserved for the release data")
 
         # Save new datasets with versioned filenames
-        new_customers.to_csv(f'data_sources/customer_release_{version}.csv', index=False)
-        new_transactions.to_parquet(f'data_sources/transactions_release_{version}.parquet')
-        new_fraud.to_json(f'data_sources/fraud_release_{version}.json', orient='records', lines=False, indent=4)
+        paths = {key: self.catalog.source_path(key, version) for key in ['customers', 'transactions', 'fraud']}
+        new_customers.to_csv(paths['customers'], index=False)
+        new_transactions.to_parquet(paths['transactions'])
+        new_fraud.to_json(paths['fraud'], orient='records', lines=False, indent=4)
+
+        # Record the new version in the catalog
+        self.catalog.register_sources(version, {
+            'customers': new_customers,
+            'transactions': new_transactions,
+            'fraud': new_fraud
+        }, paths, fraud_ratio=len(new_fraud) / len(new_transactions))
 
 if __name__ == "__main__":
     data_gen = DataGenerator()
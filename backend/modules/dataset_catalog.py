@@ -0,0 +1,168 @@
+import fcntl
+import hashlib
+import threading
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+DEFAULT_VERSION = 'v1.0'
+
+class DatasetCatalog:
+    def __init__(self, catalog_dir: str = 'storage/catalog'):
+        self.catalog_dir = catalog_dir
+        self.index_path = os.path.join(catalog_dir, 'index.json')
+        self.lock_path = os.path.join(catalog_dir, '.lock')
+
+        # The unversioned release files back the default version
+        self.data_sources = {
+            'customers': 'data_sources/customer_release.csv',
+            'transactions': 'data_sources/transactions_release.parquet',
+            'fraud': 'data_sources/fraud_release.json'
+        }
+
+    def resolve_version(self, version: str = None) -> str:
+        if not version or version == 'None':
+            return DEFAULT_VERSION
+        return version
+
+    def source_path(self, source_key: str, version: str) -> str:
+        default_path = self.data_sources[source_key]
+        if version == DEFAULT_VERSION:
+            return default_path
+        base_name, extension = default_path.rsplit('.', 1)
+        return f"{base_name}_{version}.{extension}"
+
+    def source_paths(self, version: str = None) -> Dict[str, str]:
+        version = self.resolve_version(version)
+        manifest = self.get(version)
+        if manifest and manifest.get('sources'):
+            return {key: source['path'] for key, source in manifest['sources'].items()}
+
+        # Data written before the catalog existed only follows the naming convention
+        return {key: self.source_path(key, version) for key in self.data_sources}
+
+    def list_versions(self) -> List[str]:
+        return sorted(self.read_index().keys())
+
+    def get(self, version: str) -> Dict:
+        manifest_path = self.manifest_path(version)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+
+    def register_sources(self, version: str, frames: Dict[str, pd.DataFrame], paths: Dict[str, str] = None,
+                         fraud_ratio: float = None) -> Dict:
+        version = self.resolve_version(version)
+        paths = paths or {key: self.source_path(key, version) for key in frames}
+
+        # Hash outside the lock; only the read-modify-write of the manifest needs it
+        sources = {
+            key: {
+                'path': paths[key],
+                'rows': int(len(frame)),
+                'schema': {column: str(dtype) for column, dtype in frame.dtypes.items()},
+                'sha256': self.file_hash(paths[key])
+            }
+            for key, frame in frames.items()
+        }
+
+        with self.locked():
+            manifest = self.get(version) or self.new_manifest(version)
+
+            # Stage outputs derived from different source files are stale
+            if sources != manifest['sources']:
+                manifest['stages'] = {}
+            manifest['sources'] = sources
+            if fraud_ratio is not None:
+                manifest['fraud_ratio'] = float(fraud_ratio)
+
+            self.write(manifest)
+        return manifest
+
+    def record_stage(self, version: str, stage: str, description: Dict, files: List[str] = None) -> Dict:
+        version = self.resolve_version(version)
+
+        # describe() output carries numpy dtypes and tuples, so round-trip it through JSON
+        description = json.loads(json.dumps(description, default=str))
+        description['version'] = version
+        file_hashes = {path: self.file_hash(path) for path in files or []}
+
+        with self.locked():
+            manifest = self.get(version) or self.new_manifest(version)
+            manifest['stages'][stage] = {
+                'description': description,
+                'files': file_hashes
+            }
+
+            # The raw ETL output has the authoritative fraud ratio once labels are merged
+            raw_fraud_ratio = description.get('description', {}).get('fraud_ratio')
+            if stage == 'raw_data' and raw_fraud_ratio is not None:
+                manifest['fraud_ratio'] = float(raw_fraud_ratio)
+
+            self.write(manifest)
+        return manifest
+
+    def new_manifest(self, version: str) -> Dict:
+        return {
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'sources': {},
+            'fraud_ratio': None,
+            'stages': {}
+        }
+
+    @contextmanager
+    def locked(self):
+        # Serializes manifest and index updates across threads and worker processes
+        os.makedirs(self.catalog_dir, exist_ok=True)
+        with open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def write(self, manifest: Dict) -> None:
+        # Callers hold locked() so the index read-modify-write cannot interleave
+        manifest['updated_at'] = datetime.now().isoformat()
+        self.write_json(self.manifest_path(manifest['version']), manifest)
+
+        # The index keeps listings to a single small read
+        index = self.read_index()
+        index[manifest['version']] = {
+            'created_at': manifest['created_at'],
+            'updated_at': manifest['updated_at'],
+            'fraud_ratio': manifest['fraud_ratio'],
+            'rows': {key: source['rows'] for key, source in manifest['sources'].items()}
+        }
+        self.write_json(self.index_path, index)
+
+    def read_index(self) -> Dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, 'r') as f:
+            return json.load(f)
+
+    def manifest_path(self, version: str) -> str:
+        return os.path.join(self.catalog_dir, f"{version}.json")
+
+    @staticmethod
+    def write_json(path: str, content: Dict) -> None:
+        # Write then rename so readers never see a half-written manifest
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(content, f, indent=4)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
@@ -2,6 +2,7 @@ import os
 import pandas as pd
 from typing import Dict, List
 from sklearn.model_selection import GroupShuffleSplit
+from modules.dataset_catalog import DEFAULT_VERSION
 
 class Dataset_Designer:
     def __init__(self):
@@ -30,9 +31,9 @@ class Dataset_Designer:
         
         return [self.train_data, self.test_data]
     
-    def describe(self) -> Dict:
+    def describe(self, version: str = DEFAULT_VERSION) -> Dict:
         description = {
-            'version': 'v1.0',
+            'version': version,
             'storage': 'securebank/storage/partitioned_data/',
             'description': {}
         }
@@ -54,9 +55,11 @@ class Dataset_Designer:
 
         return description
     
-    def load(self, output_filename: str) -> None:
+    def load(self, output_filename: str) -> List[str]:
         current_dir = os.getcwd()
         save_to_dir = os.path.join(os.path.dirname(current_dir), 'storage/partitioned_data')
         
         self.test_data.to_parquet(f"{save_to_dir}/{output_filename}_test")
         self.train_data.to_parquet(f"{save_to_dir}/{output_filename}_train")
+
+        return [f"{save_to_dir}/{output_filename}_test", f"{save_to_dir}/{output_filename}_train"]
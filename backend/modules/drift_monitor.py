@@ -0,0 +1,234 @@
+import os
+import threading
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from modules.dataset_catalog import DEFAULT_VERSION
+
+NUMERICAL_FEATURES = ['amt', 'merch_lat', 'merch_long', 'hour']
+CATEGORICAL_FEATURES = ['category', 'merchant']
+
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value: float) -> None:
+        # Welford's update keeps the variance numerically stable
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+class FixedHistogram:
+    def __init__(self, edges: np.ndarray):
+        # Interior edges only; the outer bins are open-ended
+        self.edges = edges
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+
+    def update(self, value: float) -> None:
+        self.counts[np.searchsorted(self.edges, value, side='right')] += 1
+
+    def proportions(self) -> np.ndarray:
+        total = self.counts.sum()
+        return self.counts / total if total > 0 else self.counts.astype(float)
+
+class TopK:
+    def __init__(self, k: int):
+        self.k = k
+        self.counts = {}
+
+    def update(self, key: str) -> None:
+        # Space-Saving: a full table evicts its smallest counter and inherits its count
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.k:
+            self.counts[key] = 1
+        else:
+            evicted = min(self.counts, key=self.counts.get)
+            self.counts[key] = self.counts.pop(evicted) + 1
+
+    def most_common(self) -> List:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+
+class DriftMonitor:
+    def __init__(self, version: str = DEFAULT_VERSION, num_bins: int = 10, top_k: int = 20):
+        self.version = version
+        self.num_bins = num_bins
+        self.top_k = top_k
+        self.lock = threading.Lock()
+        self.reference = None
+        self.unavailable = set()
+        self.reset()
+
+    def reset(self) -> None:
+        self.stats = {feature: RunningStats() for feature in NUMERICAL_FEATURES}
+        self.histograms = {}
+        self.top_values = {feature: TopK(self.top_k) for feature in CATEGORICAL_FEATURES}
+        self.category_counts = {feature: {} for feature in CATEGORICAL_FEATURES}
+        self.missing = {feature: 0 for feature in NUMERICAL_FEATURES + CATEGORICAL_FEATURES}
+        self.count = 0
+        if self.reference is not None:
+            self.histograms = {feature: FixedHistogram(np.asarray(self.reference[feature]['edges']))
+                               for feature in NUMERICAL_FEATURES}
+
+    def extract(self, training_dataset_filename: str = None) -> pd.DataFrame:
+        current_dir = os.getcwd()
+        file_dir = os.path.join(os.path.dirname(current_dir), 'storage/partitioned_data')
+        training_dataset_filename = training_dataset_filename or f"{self.version}_train"
+
+        train_data = pd.read_parquet(f"{file_dir}/{training_dataset_filename}")
+        self.fit_reference(self.feature_frame(train_data))
+
+        return train_data
+
+    def use_reference(self, version: str) -> None:
+        # Follow the active model: compare traffic with the dataset it was trained on
+        with self.lock:
+            if not version or version == self.version or version in self.unavailable:
+                return
+            previous, self.version = self.version, version
+        try:
+            self.extract()
+        except OSError:
+            # Partition not on disk; keep comparing against the previous reference
+            with self.lock:
+                self.version = previous
+                self.unavailable.add(version)
+
+    def fit_reference(self, train_data: pd.DataFrame) -> Dict:
+        reference = {}
+        for feature in NUMERICAL_FEATURES:
+            values = train_data[feature].dropna().to_numpy(dtype=float)
+
+            # Equal-frequency bins over the training data; duplicates collapse on discrete features
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, self.num_bins + 1)[1:-1]))
+            counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+            reference[feature] = {
+                'edges': edges,
+                'proportions': counts / counts.sum(),
+                'mean': float(values.mean()),
+                'std': float(values.std(ddof=1))
+            }
+
+        for feature in CATEGORICAL_FEATURES:
+            reference[feature] = {
+                'proportions': train_data[feature].astype(str).value_counts(normalize=True).to_dict()
+            }
+
+        with self.lock:
+            self.reference = reference
+            self.reset()
+
+        return reference
+
+    @staticmethod
+    def feature_frame(data: pd.DataFrame) -> pd.DataFrame:
+        frame = data[['amt', 'merch_lat', 'merch_long', 'category', 'merchant']].copy()
+        frame['hour'] = pd.to_datetime(data['trans_date_trans_time']).dt.hour
+        return frame
+
+    def update(self, input_data: Dict) -> None:
+        values = self.parse(input_data)
+
+        with self.lock:
+            self.count += 1
+            for feature in NUMERICAL_FEATURES:
+                value = values[feature]
+                if value is None or np.isnan(value):
+                    self.missing[feature] += 1
+                    continue
+                self.stats[feature].update(value)
+                if feature in self.histograms:
+                    self.histograms[feature].update(value)
+
+            for feature in CATEGORICAL_FEATURES:
+                value = values[feature]
+                if value is None:
+                    self.missing[feature] += 1
+                    continue
+                self.top_values[feature].update(value)
+                # Exact counts only for values seen in training; the rest pool into one bucket
+                if self.reference is not None and value not in self.reference[feature]['proportions']:
+                    value = None
+                self.category_counts[feature][value] = self.category_counts[feature].get(value, 0) + 1
+
+    @staticmethod
+    def parse(input_data: Dict) -> Dict:
+        values = {}
+        for feature in ['amt', 'merch_lat', 'merch_long']:
+            try:
+                values[feature] = float(input_data.get(feature))
+            except (TypeError, ValueError):
+                values[feature] = None
+        try:
+            values['hour'] = float(pd.Timestamp(input_data.get('trans_date_trans_time')).hour)
+        except (TypeError, ValueError):
+            values['hour'] = None
+        for feature in CATEGORICAL_FEATURES:
+            value = input_data.get(feature)
+            values[feature] = str(value) if value not in (None, '') else None
+        return values
+
+    def report(self) -> Dict:
+        with self.lock:
+            report = {
+                'reference_version': self.version,
+                'count': self.count,
+                'missing': dict(self.missing),
+                'features': {}
+            }
+
+            for feature in NUMERICAL_FEATURES:
+                stats = self.stats[feature]
+                entry = {
+                    'count': stats.count,
+                    'mean': stats.mean,
+                    'std': float(np.sqrt(stats.variance))
+                }
+                if self.reference is not None:
+                    expected = self.reference[feature]['proportions']
+                    actual = self.histograms[feature].proportions()
+                    entry.update({
+                        'reference_mean': self.reference[feature]['mean'],
+                        'reference_std': self.reference[feature]['std'],
+                        'psi': self.psi(expected, actual) if stats.count else None,
+                        'ks': self.ks(expected, actual) if stats.count else None
+                    })
+                report['features'][feature] = entry
+
+            for feature in CATEGORICAL_FEATURES:
+                entry = {'top_values': self.top_values[feature].most_common()}
+                counts = self.category_counts[feature]
+                total = sum(counts.values())
+                if self.reference is not None and total:
+                    reference = self.reference[feature]['proportions']
+                    keys = list(reference.keys())
+                    expected = np.array([reference[key] for key in keys] + [0.0])
+                    actual = np.array([counts.get(key, 0) for key in keys] + [counts.get(None, 0)]) / total
+                    entry.update({
+                        'psi': self.psi(expected, actual),
+                        'unseen_ratio': counts.get(None, 0) / total
+                    })
+                report['features'][feature] = entry
+
+        return report
+
+    @staticmethod
+    def psi(expected: np.ndarray, actual: np.ndarray, eps: float = 1e-4) -> float:
+        # Floor empty bins so the log ratio stays finite
+        expected = np.clip(expected, eps, None)
+        actual = np.clip(actual, eps, None)
+        return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+    @staticmethod
+    def ks(expected: np.ndarray, actual: np.ndarray) -> float:
+        # KS statistic evaluated at the shared bin edges
+        return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
@@ -4,8 +4,16 @@ import numpy as np
 from typing import Dict, List, Tuple
 from sklearn.preprocessing import StandardScaler
 from sklearn.impute import SimpleImputer
+from modules.geo_index import haversine_distance
+from modules.dataset_catalog import DEFAULT_VERSION
 
 class Feature_Extractor:
+    features = ['category', 'merchant', 'merch_lat', 'merch_long', 'hour_sin', 'hour_cos',
+                'log_amt', 'rapid_transactions', 'distance', 'prev_distance', 'unusual_region']
+    numerical_features = ['merch_lat', 'merch_long', 'log_amt', 'rapid_transactions', 'distance',
+                          'prev_distance', 'unusual_region', 'hour_sin', 'hour_cos']
+    categorical_features = ['category', 'merchant']
+
     def __init__(self):
         self.train_data = None
         self.test_data = None
@@ -13,6 +21,11 @@ class Feature_Extractor:
         self.train_target = None
         self.test_feature = None
         self.test_target = None
+        self.train_groups = None
+        self.vocabularies = None
+        self.num_imputer = None
+        self.cat_imputer = None
+        self.scaler = None
 
     def extract(self, training_dataset_filename: str, testing_dataset_filename: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
         current_dir = os.getcwd()
@@ -23,67 +36,100 @@ class Feature_Extractor:
 
         return [self.train_data, self.test_data]
     
+    def extract_features(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+        # Sort the dataframe by cc_num and transaction time
+        df = df.sort_values(by=['cc_num', 'trans_date_trans_time'])
+
+        # Time-based features
+        df['hour'] = df['trans_date_trans_time'].dt.hour
+        df['hour_sin'] = np.sin(df['hour'] * (2 * np.pi / 24))
+        df['hour_cos'] = np.cos(df['hour'] * (2 * np.pi / 24))
+        df['day_of_week'] = df['trans_date_trans_time'].dt.dayofweek
+        df['day_of_week_sin'] = np.sin(df['day_of_week'] * (2 * np.pi / 7))
+        df['day_of_week_cos'] = np.cos(df['day_of_week'] * (2 * np.pi / 7))
+        
+        # Time difference between transactions
+        df['time_diff'] = df.groupby('cc_num')['trans_date_trans_time'].diff().dt.total_seconds()
+        
+        # Feature to capture rapid successive transactions
+        df['rapid_transactions'] = df.groupby('cc_num')['time_diff'].transform(
+            lambda x: x.rolling(window=3, min_periods=1).mean()
+        )
+        
+        # Transaction amount features
+        df['log_amt'] = np.log1p(df['amt'])
+        
+        # Merchant category features stay raw here; encode() maps them to the codes the model was trained with
+        
+        # Location-based features
+        df['distance'] = haversine_distance(df['lat'], df['long'], df['merch_lat'], df['merch_long'])
+
+        # Distance from the card's previous transaction; Raw_Data_Handler tracks the previous
+        # location and unusual_region across the full timeline, before the train/test split
+        df['prev_distance'] = haversine_distance(df['prev_merch_lat'], df['prev_merch_long'],
+                                                 df['merch_lat'], df['merch_long'])
+        
+        # Select final features
+        target = 'is_fraud'
+        
+        return df[self.features], df[target]
+
+    @classmethod
+    def fit_vocabularies(cls, df: pd.DataFrame) -> Dict[str, List]:
+        return {feature: sorted(df[feature].dropna().unique().tolist()) for feature in cls.categorical_features}
+
+    @classmethod
+    def encode(cls, X: pd.DataFrame, vocabularies: Dict[str, List]) -> pd.DataFrame:
+        # Codes index the training vocabulary, so a value keeps its code in any later
+        # frame, however small; values not seen in training get -1. States saved before
+        # vocabularies were kept fall back to the frame's own values
+        X = X.copy()
+        for feature in cls.categorical_features:
+            if vocabularies:
+                X[feature] = pd.Index(vocabularies[feature]).get_indexer(X[feature])
+            else:
+                X[feature] = pd.Categorical(X[feature]).codes
+        return X
+
+    @classmethod
+    def impute(cls, X: pd.DataFrame, state: Dict) -> pd.DataFrame:
+        # Encode and impute with the vocabularies and imputers saved in a model's state
+        X = cls.encode(X, state.get('vocabularies'))
+        X[cls.numerical_features] = state['num_imputer'].transform(X[cls.numerical_features])
+        X[cls.categorical_features] = state['cat_imputer'].transform(X[cls.categorical_features])
+        return X
+
     def transform(self) -> List[pd.DataFrame]:
-        def extract_features(df):
-            # Sort the dataframe by cc_num and transaction time
-            df = df.sort_values(by=['cc_num', 'trans_date_trans_time'])
-
-            # Time-based features
-            df['hour'] = df['trans_date_trans_time'].dt.hour
-            df['hour_sin'] = np.sin(df['hour'] * (2 * np.pi / 24))
-            df['hour_cos'] = np.cos(df['hour'] * (2 * np.pi / 24))
-            df['day_of_week'] = df['trans_date_trans_time'].dt.dayofweek
-            df['day_of_week_sin'] = np.sin(df['day_of_week'] * (2 * np.pi / 7))
-            df['day_of_week_cos'] = np.cos(df['day_of_week'] * (2 * np.pi / 7))
-            
-            # Time difference between transactions
-            df['time_diff'] = df.groupby('cc_num')['trans_date_trans_time'].diff().dt.total_seconds()
-            
-            # Feature to capture rapid successive transactions
-            df['rapid_transactions'] = df.groupby('cc_num')['time_diff'].transform(
-                lambda x: x.rolling(window=3, min_periods=1).mean()
-            )
-            
-            # Transaction amount features
-            df['log_amt'] = np.log1p(df['amt'])
-            
-            # Merchant category features
-            df['category'] = pd.Categorical(df['category']).codes
-            df['merchant'] = pd.Categorical(df['merchant']).codes
-            
-            # Location-based features
-            df['distance'] = self.haversine_distance(df['lat'], df['long'], df['merch_lat'], df['merch_long'])
-            
-            # Select final features
-            features = ['category', 'merchant', 'merch_lat', 'merch_long', 'hour_sin', 'hour_cos', 
-                        'log_amt', 'rapid_transactions', 'distance']
-            target = 'is_fraud'
-            
-            return df[features], df[target]
-
-        X_train, y_train = extract_features(self.train_data)
-        X_test, y_test = extract_features(self.test_data)
+        X_train, y_train = self.extract_features(self.train_data)
+        X_test, y_test = self.extract_features(self.test_data)
+
+        # Category and merchant codes come from the training partition only
+        self.vocabularies = self.fit_vocabularies(self.train_data)
+        X_train = self.encode(X_train, self.vocabularies)
+        X_test = self.encode(X_test, self.vocabularies)
+
+        # Card of each training row (extract_features orders rows by card), for grouped splits
+        self.train_groups = np.sort(self.train_data['cc_num'].to_numpy())
 
         # Handle missing values
-        numerical_features = ['merch_lat', 'merch_long', 'log_amt', 'rapid_transactions', 'distance',
-                              'hour_sin', 'hour_cos']
-        categorical_features = ['category', 'merchant']
+        numerical_features = self.numerical_features
+        categorical_features = self.categorical_features
 
         # Impute missing values in training set
-        num_imputer = SimpleImputer(strategy='mean')
-        cat_imputer = SimpleImputer(strategy='most_frequent')
+        self.num_imputer = SimpleImputer(strategy='mean')
+        self.cat_imputer = SimpleImputer(strategy='most_frequent')
 
-        X_train[numerical_features] = num_imputer.fit_transform(X_train[numerical_features])
-        X_train[categorical_features] = cat_imputer.fit_transform(X_train[categorical_features])
+        X_train[numerical_features] = self.num_imputer.fit_transform(X_train[numerical_features])
+        X_train[categorical_features] = self.cat_imputer.fit_transform(X_train[categorical_features])
 
         # Impute missing values in test set
-        X_test[numerical_features] = num_imputer.transform(X_test[numerical_features])
-        X_test[categorical_features] = cat_imputer.transform(X_test[categorical_features])
+        X_test[numerical_features] = self.num_imputer.transform(X_test[numerical_features])
+        X_test[categorical_features] = self.cat_imputer.transform(X_test[categorical_features])
 
-        # Scale features
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
+        # Scale features; the fitted imputers and scaler are kept for incremental retraining
+        self.scaler = StandardScaler()
+        X_train_scaled = self.scaler.fit_transform(X_train)
+        X_test_scaled = self.scaler.transform(X_test)
 
         self.train_feature = pd.DataFrame(X_train_scaled, columns=X_train.columns)
         self.train_target = pd.DataFrame(y_train)
@@ -93,9 +139,9 @@ class Feature_Extractor:
         return [self.train_feature, self.train_target, self.test_feature, self.test_target]
 
  
-    def describe(self) -> Dict:
+    def describe(self, version: str = DEFAULT_VERSION) -> Dict:
         description = {
-            'version': 'v1.0',
+            'version': version,
             'storage': 'securebank/storage/features/',
             'description': {}
         }
@@ -111,24 +157,14 @@ class Feature_Extractor:
         
         return description
 
-    def load(self, output_filename: str) -> None:
+    def load(self, output_filename: str) -> List[str]:
         current_dir = os.getcwd()
         save_to_dir = os.path.join(os.path.dirname(current_dir), 'storage/features')
 
+        paths = []
         data = [self.train_feature, self.train_target, self.test_feature, self.test_target]
         for i, dataset in enumerate(['train_features', 'train_target', 'test_features', 'test_target']):
             data[i].to_parquet(f"{save_to_dir}/{output_filename}_{dataset}")
+            paths.append(f"{save_to_dir}/{output_filename}_{dataset}")
 
-    @staticmethod
-    def haversine_distance(lat1, lon1, lat2, lon2):
-        R = 6371  # Earth's radius in km
-
-        lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-
-        a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
-        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
-        distance = R * c
-
-        return distance
\ No newline at end of file
+        return paths
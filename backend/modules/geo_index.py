@@ -0,0 +1,188 @@
+import threading
+from typing import Callable, ContextManager, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+REGION_DEGREES = 1.0
+REGION_COLUMNS = int(np.ceil(360 / REGION_DEGREES)) + 1
+
+def region_cell(lat, long) -> np.ndarray:
+    # Fixed lat/long grid; cell ids are comparable across tables and processes
+    row = np.floor((np.asarray(lat, dtype=float) + 90) / REGION_DEGREES)
+    column = np.floor((np.asarray(long, dtype=float) + 180) / REGION_DEGREES)
+    return (row * REGION_COLUMNS + column).astype(np.int64)
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    R = 6371  # Earth's radius in km
+
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    distance = R * c
+
+    return distance
+
+LIVE_CAPACITY = 2 ** 18
+
+class LiveCache:
+    # Direct-mapped cache over flat arrays, so it can live in a shared memory-mapped
+    # table: each key hashes to one slot and a newer key overwrites the older one.
+    # Writers serialize on a lock; readers don't lock but check a per-slot sequence
+    # number (odd while a write is in progress) and treat a torn read as a miss.
+    def __init__(self, arrays: Dict[str, np.ndarray], prefix: str, lock: Callable[[], ContextManager]):
+        self.seq = arrays[f"{prefix}_seq"]
+        self.keys = arrays[f"{prefix}_keys"]
+        self.values = arrays[f"{prefix}_values"]
+        self.lock = lock
+
+    @staticmethod
+    def empty(prefix: str, capacity: int, key_width: int, value_width: int) -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}_seq": np.zeros(capacity, dtype=np.int64),
+            f"{prefix}_keys": np.zeros((capacity, key_width), dtype=np.int64),
+            f"{prefix}_values": np.zeros((capacity, value_width), dtype=np.float64)
+        }
+
+    def slot(self, key: Tuple[int, ...]) -> int:
+        # Integer tuples hash the same in every process
+        return hash(key) % len(self.seq)
+
+    def get(self, key: Tuple[int, ...]) -> Tuple[float, ...]:
+        slot = self.slot(key)
+        seq = int(self.seq[slot])
+        if seq == 0 or seq % 2:
+            return None
+        stored_key = tuple(int(k) for k in self.keys[slot])
+        value = tuple(float(v) for v in self.values[slot])
+        if int(self.seq[slot]) != seq or stored_key != key:
+            return None
+        return value
+
+    def put(self, key: Tuple[int, ...], value: Tuple[float, ...] = ()) -> None:
+        slot = self.slot(key)
+        with self.lock():
+            self.seq[slot] += 1
+            self.keys[slot] = key
+            self.values[slot] = value
+            self.seq[slot] += 1
+
+class GeoIndex:
+    def __init__(self, arrays: Dict[str, np.ndarray], live_arrays: Dict[str, np.ndarray] = None,
+                 lock: Callable[[], ContextManager] = None):
+        # Compact sorted arrays so every lookup is a binary search
+        self.customer_cc_num = arrays['customer_cc_num']
+        self.customer_lat = arrays['customer_lat']
+        self.customer_long = arrays['customer_long']
+        self.last_cc_num = arrays['last_cc_num']
+        self.last_lat = arrays['last_lat']
+        self.last_long = arrays['last_long']
+        self.region_cc_num = arrays['region_cc_num']
+        self.region_cell = arrays['region_cell']
+
+        # Locations seen while serving, layered over the historical tables. Both caches
+        # have a fixed size; an overwritten card falls back to its historical location
+        # and regions. Pass shared live_arrays and a cross-process lock so every worker
+        # sees the same recent history.
+        if live_arrays is None:
+            live_arrays = self.empty_live()
+        if lock is None:
+            thread_lock = threading.Lock()
+            lock = lambda: thread_lock
+        self.live_locations = LiveCache(live_arrays, 'location', lock)
+        self.live_regions = LiveCache(live_arrays, 'region', lock)
+
+    @staticmethod
+    def empty_live(capacity: int = LIVE_CAPACITY) -> Dict[str, np.ndarray]:
+        return {**LiveCache.empty('location', capacity, 1, 2), **LiveCache.empty('region', capacity, 2, 0)}
+
+    @classmethod
+    def build(cls, customer_data: pd.DataFrame, raw_data: pd.DataFrame) -> 'GeoIndex':
+        customers = customer_data.drop_duplicates('cc_num').sort_values('cc_num')
+
+        # Transactions in time order (parsed by Raw_Data_Handler.transform), so the
+        # last row per card is its latest location
+        transactions = raw_data.dropna(subset=['merch_lat', 'merch_long'])
+        transactions = transactions.sort_values('trans_date_trans_time')
+        last = transactions.drop_duplicates('cc_num', keep='last').sort_values('cc_num')
+
+        # Distinct (card, region) pairs sorted by card, then region
+        regions = pd.DataFrame({
+            'cc_num': transactions['cc_num'].to_numpy(dtype=np.int64),
+            'cell': region_cell(transactions['merch_lat'], transactions['merch_long'])
+        }).drop_duplicates().sort_values(['cc_num', 'cell'])
+
+        return cls({
+            'customer_cc_num': customers['cc_num'].to_numpy(dtype=np.int64),
+            'customer_lat': customers['lat'].to_numpy(dtype=np.float64),
+            'customer_long': customers['long'].to_numpy(dtype=np.float64),
+            'last_cc_num': last['cc_num'].to_numpy(dtype=np.int64),
+            'last_lat': last['merch_lat'].to_numpy(dtype=np.float64),
+            'last_long': last['merch_long'].to_numpy(dtype=np.float64),
+            'region_cc_num': regions['cc_num'].to_numpy(dtype=np.int64),
+            'region_cell': regions['cell'].to_numpy(dtype=np.int64)
+        })
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'customer_cc_num': self.customer_cc_num,
+            'customer_lat': self.customer_lat,
+            'customer_long': self.customer_long,
+            'last_cc_num': self.last_cc_num,
+            'last_lat': self.last_lat,
+            'last_long': self.last_long,
+            'region_cc_num': self.region_cc_num,
+            'region_cell': self.region_cell
+        }
+
+    @staticmethod
+    def lookup(keys: np.ndarray, cc_num: int) -> int:
+        idx = np.searchsorted(keys, cc_num)
+        if idx < len(keys) and keys[idx] == cc_num:
+            return idx
+        return None
+
+    def home(self, cc_num: int) -> Tuple[float, float]:
+        idx = self.lookup(self.customer_cc_num, cc_num)
+        if idx is None:
+            return None
+        return float(self.customer_lat[idx]), float(self.customer_long[idx])
+
+    def previous_location(self, cc_num: int) -> Tuple[float, float]:
+        live = self.live_locations.get((cc_num,))
+        if live is not None:
+            return live
+        idx = self.lookup(self.last_cc_num, cc_num)
+        if idx is None:
+            return None
+        return float(self.last_lat[idx]), float(self.last_long[idx])
+
+    def distance_from_home(self, cc_num: int, lat: float, long: float) -> float:
+        home = self.home(cc_num)
+        if home is None:
+            return None
+        return float(haversine_distance(home[0], home[1], lat, long))
+
+    def distance_from_previous(self, cc_num: int, lat: float, long: float) -> float:
+        previous = self.previous_location(cc_num)
+        if previous is None:
+            return None
+        return float(haversine_distance(previous[0], previous[1], lat, long))
+
+    def is_unusual_region(self, cc_num: int, lat: float, long: float) -> bool:
+        cell = int(region_cell(lat, long))
+        if self.live_regions.get((cc_num, cell)) is not None:
+            return False
+
+        # The card's regions are a contiguous sorted run of region_cell
+        start = np.searchsorted(self.region_cc_num, cc_num, side='left')
+        end = np.searchsorted(self.region_cc_num, cc_num, side='right')
+        idx = start + np.searchsorted(self.region_cell[start:end], cell)
+        return not (idx < end and self.region_cell[idx] == cell)
+
+    def observe(self, cc_num: int, lat: float, long: float) -> None:
+        self.live_locations.put((cc_num,), (lat, long))
+        self.live_regions.put((cc_num, int(region_cell(lat, long))))
@@ -0,0 +1,162 @@
+from modules.raw_data_handler import Raw_Data_Handler
+from modules.feature_extractor import Feature_Extractor
+from modules.dataset_catalog import DatasetCatalog
+from modules.model_trainer import ModelTrainer
+from modules.pipeline import raw_score, fit_calibrator, score_model
+from modules.performance_auditor import PerformanceAuditor
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import GroupShuffleSplit
+from sklearn.metrics import precision_score, recall_score, f1_score
+import copy
+import joblib
+import numpy as np
+import pandas as pd
+import json
+import os
+from typing import Dict, List, Tuple
+
+class IncrementalTrainer:
+    def __init__(self, new_trees: int = 10, max_trees: int = 200):
+        self.catalog = DatasetCatalog()
+        # Each update grows a forest by new_trees; past max_trees the oldest trees are retired
+        self.new_trees = new_trees
+        self.max_trees = max_trees
+
+    def load_delta(self, version: str, state: Dict) -> pd.DataFrame:
+        paths = self.catalog.source_paths(version)
+
+        raw_data_handler = Raw_Data_Handler()
+        raw_data_handler.extract(
+            customer_information_filename = paths['customers'],
+            transaction_filename=paths['transactions'],
+            fraud_information_filename=paths['fraud'])
+        return self.select_delta(raw_data_handler.transform(), state)
+
+    @staticmethod
+    def select_delta(raw_data: pd.DataFrame, state: Dict) -> pd.DataFrame:
+        # Transactions the current model has not seen yet, plus ones it has seen whose
+        # label has changed since (e.g. fraud confirmed late). States saved before the
+        # labels were kept only get the new transactions
+        seen = raw_data['trans_date_trans_time'] <= state['watermark']
+        if 'fraud_labels' not in state:
+            return raw_data[~seen]
+        was_fraud = raw_data.index.isin(state['fraud_labels'])
+        relabeled = seen & (raw_data['is_fraud'].astype(bool) != was_fraud)
+        return raw_data[~seen | relabeled]
+
+    def split(self, delta: pd.DataFrame) -> List[pd.DataFrame]:
+        # Keep data with the same cc_num together, as Dataset_Designer does: 60% to
+        # update the model, 20% to calibrate it and pick its threshold, 20% to report on
+        gss = GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+        rest_idx, test_idx = next(gss.split(delta, groups=delta['cc_num']))
+        rest, test = delta.iloc[rest_idx], delta.iloc[test_idx]
+
+        gss = GroupShuffleSplit(n_splits=1, test_size=0.25, random_state=42)
+        train_idx, cal_idx = next(gss.split(rest, groups=rest['cc_num']))
+        return [rest.iloc[train_idx], rest.iloc[cal_idx], test]
+
+    def preprocess(self, state: Dict, df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+        X, y = Feature_Extractor().extract_features(df)
+
+        # Encode and impute with the vocabularies and statistics from the original training data
+        return Feature_Extractor.impute(X, state), y.to_numpy().astype(int)
+
+    def update_model(self, model, state: Dict, X: pd.DataFrame, y: np.ndarray):
+        if hasattr(model, 'partial_fit') and hasattr(model, 'coef_'):
+            # A linear model can follow a scaler update exactly: fold the delta into
+            # the running mean and variance, re-express the coefficients in the new
+            # scaling, then learn from the delta
+            old_scaler = copy.deepcopy(state['scaler'])
+            state['scaler'].partial_fit(X)
+            self.rescale_coefficients(model, old_scaler, state['scaler'])
+            model.partial_fit(state['scaler'].transform(X), y, classes=[0, 1])
+        elif hasattr(model, 'partial_fit'):
+            # Non-linear models learned on the old scaling, so the scaler stays frozen
+            model.partial_fit(state['scaler'].transform(X), y, classes=[0, 1])
+        elif isinstance(model, RandomForestClassifier):
+            # Existing trees split on the old scaling, so the scaler stays frozen.
+            # New trees are grown on the delta, retiring the oldest past max_trees
+            keep = max(self.max_trees - self.new_trees, 0)
+            model.estimators_ = model.estimators_[-keep:] if keep else []
+            model.set_params(warm_start=True, n_estimators=len(model.estimators_) + self.new_trees)
+            model.fit(state['scaler'].transform(X), y)
+        else:
+            # Refitting on the delta alone (e.g. a warm-started LogisticRegression)
+            # would forget everything learned before
+            raise ValueError(f"Model type {type(model).__name__} cannot be updated incrementally; "
+                             "use a partial_fit model such as sgd, a random forest, or /train_model/")
+        return model
+
+    @staticmethod
+    def rescale_coefficients(model, old_scaler: StandardScaler, new_scaler: StandardScaler) -> None:
+        # w.(x - m1)/s1 + b == w'.(x - m2)/s2 + b' with w' = w*s2/s1 and b' = b + w.(m2 - m1)/s1
+        coef = model.coef_ / old_scaler.scale_
+        model.intercept_ = model.intercept_ + coef @ (new_scaler.mean_ - old_scaler.mean_)
+        model.coef_ = coef * new_scaler.scale_
+
+    def retrain(self, model_name: str, data_version: str = None) -> Dict:
+        state = ModelTrainer.load_state(model_name)
+        model = joblib.load(f'storage/models/artifacts/{model_name}.joblib')
+
+        delta = self.load_delta(data_version, state)
+        if delta.empty:
+            raise ValueError(f"No new or relabeled transactions since {state['watermark']} in dataset {data_version}")
+
+        train_delta, cal_delta, test_delta = self.split(delta)
+        X_train, y_train = self.preprocess(state, train_delta)
+        X_cal, y_cal = self.preprocess(state, cal_delta)
+        X_test, y_test = self.preprocess(state, test_delta)
+        if len(np.unique(y_train)) < 2 or len(np.unique(y_cal)) < 2:
+            raise ValueError("New transactions must include both fraudulent and legitimate labels")
+
+        model = self.update_model(model, state, X_train, y_train)
+
+        # Recalibrate the updated model on its own held-out slice of the delta
+        X_cal = state['scaler'].transform(X_cal)
+        X_test = state['scaler'].transform(X_test)
+        calibrator = fit_calibrator(raw_score(model, X_cal), y_cal)
+
+        # Re-pick the operating point for the same target FPR as the previous model
+        target_fpr = 0.01
+        threshold_path = f'storage/models/artifacts/{model_name}_threshold.json'
+        if os.path.exists(threshold_path):
+            with open(threshold_path, 'r') as f:
+                target_fpr = json.load(f).get('target_fpr', target_fpr)
+        # Picked on the calibration slice; the test slice is kept for reporting only
+        cal_score = score_model(model, X_cal, calibrator)
+        operating_point = PerformanceAuditor.select_threshold(y_cal, cal_score, target_fpr)
+        y_pred = score_model(model, X_test, calibrator) >= operating_point['threshold']
+
+        # Publish as a new revision; the previous artifact stays available for rollback
+        revision = state['revision'] + 1
+        while os.path.exists(f"storage/models/artifacts/{state['base_model']}_r{revision}.joblib"):
+            revision += 1
+        new_model_name = f"{state['base_model']}_r{revision}"
+        joblib.dump(model, f'storage/models/artifacts/{new_model_name}.joblib')
+        joblib.dump(calibrator, f'storage/models/artifacts/{new_model_name}_calibration.joblib')
+        with open(f'storage/models/artifacts/{new_model_name}_threshold.json', 'w') as f:
+            json.dump(operating_point, f, indent=4)
+        state['revision'] = revision
+        state['watermark'] = max(state['watermark'], delta['trans_date_trans_time'].max())
+        if 'fraud_labels' in state:
+            fraud_labels = set(state['fraud_labels']) - set(delta.index[delta['is_fraud'] == 0].astype(str))
+            state['fraud_labels'] = sorted(fraud_labels | set(delta.index[delta['is_fraud'] == 1].astype(str)))
+        state['data_version'] = self.catalog.resolve_version(data_version)
+        ModelTrainer.save_state(new_model_name, state)
+
+        return {
+            new_model_name: {
+                'new_transactions': len(delta),
+                'precision': precision_score(y_test, y_pred),
+                'recall': recall_score(y_test, y_pred),
+                'f1': f1_score(y_test, y_pred),
+                'threshold': operating_point['threshold']
+            }
+        }
+
+if __name__ == "__main__":
+    trainer = IncrementalTrainer()
+    results = trainer.retrain('random_forest', 'v2.0')
+    print(results)
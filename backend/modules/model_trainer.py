@@ -1,76 +1,75 @@
 from modules.raw_data_handler import Raw_Data_Handler
 from modules.dataset_design import Dataset_Designer
 from modules.feature_extractor import Feature_Extractor
+from modules.dataset_catalog import DatasetCatalog
+from modules.pipeline import raw_score, fit_calibrator, score_model
+from modules.performance_auditor import PerformanceAuditor
 
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import GroupShuffleSplit
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import joblib
+import numpy as np
 import pandas as pd
 import json
 import os
+from typing import Dict, List
 
 class ModelTrainer:
     def __init__(self):
         self.models = {
             'random_forest': RandomForestClassifier(random_state=42),
             'logistic_regression': LogisticRegression(random_state=42),
-            'svm': SVC(random_state=42)
+            'svm': SVC(random_state=42),
+            'sgd': SGDClassifier(loss='log', random_state=42)
         }
 
-        self.data_sources = {
-            'customers': 'data_sources/customer_release.csv',
-            'transactions': 'data_sources/transactions_release.parquet',
-            'fraud': 'data_sources/fraud_release.json'
-        }
+        self.catalog = DatasetCatalog()
         self.customers_df = None
         self.transactions_df = None
         self.fraud_df = None
+        self.feature_extractor = None
+        self.data_version = None
 
     def load_data(self, version: str = None):
-        # Create paths using the version string
-        customer_path = self.construct_path('customers', version)
-        transactions_path = self.construct_path('transactions', version)
-        fraud_path = self.construct_path('fraud', version)
-
-        if not version:
-            version = 'v1.1'
+        # Look up the source files for this version in the catalog
+        version = self.catalog.resolve_version(version)
+        paths = self.catalog.source_paths(version)
 
         raw_data_handler = Raw_Data_Handler()
         raw_data_handler.extract(
-            customer_information_filename = customer_path, 
-            transaction_filename=transactions_path, 
-            fraud_information_filename=fraud_path)
+            customer_information_filename = paths['customers'], 
+            transaction_filename=paths['transactions'], 
+            fraud_information_filename=paths['fraud'])
         raw_data_handler.transform()
-        raw_data_handler.load(f'{version}')
-        raw_data_handler.describe()
+        raw_path = raw_data_handler.load(f'{version}')
+        self.catalog.record_stage(version, 'raw_data', raw_data_handler.describe(version), [raw_path])
 
         dataset_designer = Dataset_Designer()
         dataset_designer.extract(f'{version}')
         dataset_designer.sample()
-        dataset_designer.load(f'{version}')
+        partition_paths = dataset_designer.load(f'{version}')
+        self.catalog.record_stage(version, 'partitioned_data', dataset_designer.describe(version), partition_paths)
 
         feature_extractor = Feature_Extractor()
         feature_extractor.extract(f'{version}_train', f'{version}_test')
         processed_data = feature_extractor.transform()
-        feature_extractor.load(f'{version}')
+        feature_paths = feature_extractor.load(f'{version}')
+        self.catalog.record_stage(version, 'features', feature_extractor.describe(version), feature_paths)
+        self.feature_extractor = feature_extractor
+        self.data_version = version
 
         return processed_data
-    
-    def construct_path(self, source_key: str, version: str) -> str:
-        default_path = self.data_sources[source_key]
-        if version:
-            # Extract the base name and file extension from the default path
-            base_name, extension = default_path.rsplit('.', 1)
-            # Construct the path using the version
-            return f"{base_name}_{version}.{extension}"
-        return default_path
-
-    def train(self, model_name, data_version=None):
+
+    def train(self, model_name, data_version=None, target_fpr=0.01):
         if data_version == 'None':
             data_version = None
+        # Fail before the ETL and fit rather than after
+        PerformanceAuditor.validate_target_fpr(target_fpr)
+        if model_name not in self.models:
+            raise ValueError(f"Unknown model {model_name}")
 
         # Load and preprocess data
         X_train, y_train, X_test, y_test  = self.load_data(data_version)
@@ -78,21 +77,76 @@ class ModelTrainer:
         results = {}
         model = self.models[model_name]
 
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
+        # Hold back part of the training partition to calibrate the scores and pick the
+        # threshold on; cards stay on one side, as in Dataset_Designer
+        groups = self.feature_extractor.train_groups
+        gss = GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+        fit_idx, cal_idx = next(gss.split(X_train, groups=groups))
+        X_fit, X_cal = X_train.iloc[fit_idx], X_train.iloc[cal_idx]
+        y_fit, y_cal = np.ravel(y_train.iloc[fit_idx]), np.ravel(y_train.iloc[cal_idx])
+        if len(np.unique(y_fit)) < 2 or len(np.unique(y_cal)) < 2:
+            raise ValueError("Training partition must include both fraudulent and legitimate labels")
+
+        model.fit(X_fit, y_fit)
+        calibrator = fit_calibrator(raw_score(model, X_cal), y_cal)
+
+        # Pick the operating point on held-out calibrated scores rather than predict()'s
+        # fixed cut-off; the test partition is kept for reporting only
+        cal_score = score_model(model, X_cal, calibrator)
+        operating_point = PerformanceAuditor.select_threshold(y_cal, cal_score, target_fpr)
+        y_pred = score_model(model, X_test, calibrator) >= operating_point['threshold']
             
         results[model_name] = {
             'precision': precision_score(y_test, y_pred),
             'recall': recall_score(y_test, y_pred),
-            'f1': f1_score(y_test, y_pred)
+            'f1': f1_score(y_test, y_pred),
+            'threshold': operating_point['threshold']
         }
             
-        # Save the model
+        # Save the model, its calibration and its threshold side by side
         os.makedirs('storage/models/artifacts', exist_ok=True)
         joblib.dump(model, f'storage/models/artifacts/{model_name}.joblib')
+        joblib.dump(calibrator, f'storage/models/artifacts/{model_name}_calibration.joblib')
+        with open(f'storage/models/artifacts/{model_name}_threshold.json', 'w') as f:
+            json.dump(operating_point, f, indent=4)
+        self.save_state(model_name, {
+            'base_model': model_name,
+            'revision': 0,
+            'vocabularies': self.feature_extractor.vocabularies,
+            'num_imputer': self.feature_extractor.num_imputer,
+            'cat_imputer': self.feature_extractor.cat_imputer,
+            'scaler': self.feature_extractor.scaler,
+            'data_version': self.data_version,
+            'watermark': self.watermark(self.feature_extractor),
+            'fraud_labels': self.fraud_labels(self.feature_extractor)
+        })
 
         return results
 
+    @staticmethod
+    def watermark(feature_extractor: Feature_Extractor) -> pd.Timestamp:
+        # Latest transaction the model has seen; incremental retraining starts after it
+        return max(feature_extractor.train_data['trans_date_trans_time'].max(),
+                   feature_extractor.test_data['trans_date_trans_time'].max())
+
+    @staticmethod
+    def fraud_labels(feature_extractor: Feature_Extractor) -> List[str]:
+        # Transactions the model saw labeled as fraud, so later label changes can be found
+        data = pd.concat([feature_extractor.train_data, feature_extractor.test_data])
+        return sorted(data.index[data['is_fraud'] == 1].astype(str))
+
+    @staticmethod
+    def save_state(model_name: str, state: Dict) -> None:
+        # Fitted preprocessing kept next to the artifact so it can be updated incrementally
+        joblib.dump(state, f'storage/models/artifacts/{model_name}_state.joblib')
+
+    @staticmethod
+    def load_state(model_name: str) -> Dict:
+        state_path = f'storage/models/artifacts/{model_name}_state.joblib'
+        if not os.path.exists(state_path):
+            raise ValueError(f"Model {model_name} has no saved training state; train it with ModelTrainer first")
+        return joblib.load(state_path)
+
 if __name__ == "__main__":
     trainer = ModelTrainer()
     results = trainer.train('random_forest')
@@ -1,83 +1,175 @@
 from modules.raw_data_handler import Raw_Data_Handler
 from modules.dataset_design import Dataset_Designer
 from modules.feature_extractor import Feature_Extractor
+from modules.dataset_catalog import DatasetCatalog
 from modules.pipeline import Pipeline
 
+import numpy as np
 import pandas as pd
+import numbers
+from typing import Dict
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 
 class PerformanceAuditor:
     def __init__(self):
-        self.data_sources = {
-            'customers': 'data_sources/customer_release.csv',
-            'transactions': 'data_sources/transactions_release.parquet',
-            'fraud': 'data_sources/fraud_release.json'
-        }
+        self.catalog = DatasetCatalog()
         self.customers_df = None
         self.transactions_df = None
         self.fraud_df = None
+        self.feature_extractor = None
 
     def load_data(self, version: str = None):
-        # Create paths using the version string
-        customer_path = self.construct_path('customers', version)
-        transactions_path = self.construct_path('transactions', version)
-        fraud_path = self.construct_path('fraud', version)
-
-        if not version:
-            version = 'v1.1'
+        # Look up the source files for this version in the catalog
+        version = self.catalog.resolve_version(version)
+        paths = self.catalog.source_paths(version)
 
         raw_data_handler = Raw_Data_Handler()
         raw_data_handler.extract(
-            customer_information_filename = customer_path, 
-            transaction_filename=transactions_path, 
-            fraud_information_filename=fraud_path)
+            customer_information_filename = paths['customers'], 
+            transaction_filename=paths['transactions'], 
+            fraud_information_filename=paths['fraud'])
         raw_data_handler.transform()
-        raw_data_handler.load(f'{version}')
-        raw_data_handler.describe()
+        raw_path = raw_data_handler.load(f'{version}')
+        self.catalog.record_stage(version, 'raw_data', raw_data_handler.describe(version), [raw_path])
 
         dataset_designer = Dataset_Designer()
         dataset_designer.extract(f'{version}')
         dataset_designer.sample()
-        dataset_designer.load(f'{version}')
+        partition_paths = dataset_designer.load(f'{version}')
+        self.catalog.record_stage(version, 'partitioned_data', dataset_designer.describe(version), partition_paths)
 
         feature_extractor = Feature_Extractor()
         feature_extractor.extract(f'{version}_train', f'{version}_test')
         processed_data = feature_extractor.transform()
-        feature_extractor.load(f'{version}')
+        feature_paths = feature_extractor.load(f'{version}')
+        self.catalog.record_stage(version, 'features', feature_extractor.describe(version), feature_paths)
+        self.feature_extractor = feature_extractor
 
         return processed_data
 
-    def construct_path(self, source_key: str, version: str) -> str:
-        default_path = self.data_sources[source_key]
-        if version:
-            # Extract the base name and file extension from the default path
-            base_name, extension = default_path.rsplit('.', 1)
-            # Construct the path using the version
-            return f"{base_name}_{version}.{extension}"
-        return default_path
-    
-    def audit(self, pipeline, data_version=None):
+    @staticmethod
+    def threshold_sweep(y_true, y_score) -> Dict[str, np.ndarray]:
+        y_true = np.asarray(y_true).ravel().astype(int)
+        y_score = np.asarray(y_score, dtype=float).ravel()
+        if y_score.size == 0:
+            raise ValueError("Cannot sweep thresholds over an empty score set")
+
+        # A single descending sort; every distinct score is a candidate threshold
+        order = np.argsort(-y_score, kind='mergesort')
+        y_score = y_score[order]
+        y_true = y_true[order]
+
+        # Cumulative counts of what gets flagged when thresholding at each position
+        tp = np.cumsum(y_true)
+        fp = np.cumsum(1 - y_true)
+
+        # Tied scores are flagged together, so keep only the last position of each run
+        last = np.r_[np.flatnonzero(np.diff(y_score)), y_score.size - 1]
+        thresholds = y_score[last]
+        tp = tp[last]
+        fp = fp[last]
+
+        # Operating point just above the highest score flags nothing
+        thresholds = np.r_[np.nextafter(y_score[0], np.inf), thresholds]
+        tp = np.r_[0, tp]
+        fp = np.r_[0, fp]
+
+        positives = tp[-1]
+        negatives = fp[-1]
+        false_positive_rate = fp / negatives if negatives > 0 else np.zeros(fp.size)
+        false_negative_rate = (positives - tp) / positives if positives > 0 else np.zeros(tp.size)
+
+        return {
+            'thresholds': thresholds,
+            'false_positive_rate': false_positive_rate,
+            'false_negative_rate': false_negative_rate
+        }
+
+    @staticmethod
+    def validate_target_fpr(target_fpr: float) -> None:
+        if isinstance(target_fpr, bool) or not isinstance(target_fpr, numbers.Real) or not 0 <= target_fpr <= 1:
+            raise ValueError(f"Target FPR must be a number between 0 and 1, got {target_fpr!r}")
+
+    @staticmethod
+    def select_threshold(y_true, y_score, target_fpr: float) -> Dict:
+        PerformanceAuditor.validate_target_fpr(target_fpr)
+        sweep = PerformanceAuditor.threshold_sweep(y_true, y_score)
+
+        # FPR only grows as the threshold drops, so the last threshold within
+        # the target is the one with the lowest FNR
+        idx = np.searchsorted(sweep['false_positive_rate'], target_fpr, side='right') - 1
+
+        return {
+            'threshold': float(sweep['thresholds'][idx]),
+            'target_fpr': float(target_fpr),
+            'false_positive_rate': float(sweep['false_positive_rate'][idx]),
+            'false_negative_rate': float(sweep['false_negative_rate'][idx])
+        }
+
+    def compare_models(self, records: Dict, labels: Dict) -> Dict:
+        # Join shadow records with the labels that have arrived so far
+        outcomes = {}
+        for key, label in labels.items():
+            record = records.get(key)
+            if record is None:
+                continue
+            champion_prediction = record['scores'][record['champion']]['prediction']
+            for name, result in record['scores'].items():
+                outcome = outcomes.setdefault(name, {'y': [], 'y_pred': [], 'agree': [], 'latency_ms': []})
+                outcome['y'].append(int(label))
+                outcome['y_pred'].append(bool(result['prediction']))
+                outcome['agree'].append(result['prediction'] == champion_prediction)
+                outcome['latency_ms'].append(result['latency_ms'])
+
+        comparison = {}
+        for name, outcome in outcomes.items():
+            tn, fp, fn, tp = confusion_matrix(outcome['y'], outcome['y_pred'], labels=[0, 1]).ravel()
+            comparison[name] = {
+                'labeled': len(outcome['y']),
+                'false_positive_rate': float(fp / (fp + tn)) if (fp + tn) > 0 else 0,
+                'false_negative_rate': float(fn / (fn + tp)) if (fn + tp) > 0 else 0,
+                'agreement_rate': float(np.mean(outcome['agree'])),
+                'mean_latency_ms': float(np.mean(outcome['latency_ms']))
+            }
+
+        return comparison
+
+    def audit(self, pipeline, data_version=None, target_fpr=None):
         if data_version == 'None':
             data_version = None
+        if target_fpr is not None:
+            self.validate_target_fpr(target_fpr)
 
-        # Load and preprocess data
-        X, y, _, _  = self.load_data(data_version)
-        X_df = pd.DataFrame(X)
-        X_dict = X_df.to_dict(orient='records')
-        y_pred = pipeline.predict(X_dict)
-        # y_pred = [pipeline.predict(row.to_dict()) for _, row in X.iterrows()]
+        # Audit and tune on the held-out partition. The features stay unscaled here:
+        # the pipeline prepares them with the model's own saved state, as in serving,
+        # not with the imputers and scaler refit on this dataset
+        self.load_data(data_version)
+        X, y = self.feature_extractor.extract_features(self.feature_extractor.test_data)
+        y = np.asarray(y).ravel()
+        y_score = pipeline.score(X)
+        version = pipeline.version
+        threshold = pipeline.threshold
+        y_pred = y_score >= threshold
         
-        tn, fp, fn, tp = confusion_matrix(y, y_pred).ravel()
+        tn, fp, fn, tp = confusion_matrix(y, y_pred, labels=[0, 1]).ravel()
 
         # Calculate FPR and FNR
         false_positive_rate = fp / (fp + tn) if (fp + tn) > 0 else 0
         false_negative_rate = fn / (fn + tp) if (fn + tp) > 0 else 0
 
-        return {
-            'false_positive_rate': false_positive_rate,
-            'false_negative_rate': false_negative_rate
+        result = {
+            'version': version,
+            'threshold': float(threshold),
+            'false_positive_rate': float(false_positive_rate),
+            'false_negative_rate': float(false_negative_rate)
         }
 
+        # Operating point for the requested alert volume, from the same scores
+        if target_fpr is not None:
+            result['operating_point'] = self.select_threshold(y, y_score, target_fpr)
+
+        return result
+
 if __name__ == "__main__":
     pipe = Pipeline('logistic_regression')
     auditor = PerformanceAuditor()
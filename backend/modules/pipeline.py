@@ -1,59 +1,313 @@
 from modules.raw_data_handler import Raw_Data_Handler
 from modules.dataset_design import Dataset_Designer
 from modules.feature_extractor import Feature_Extractor
+from modules.dataset_catalog import DatasetCatalog, DEFAULT_VERSION
+from modules.shared_store import SharedStore
+from modules.geo_index import GeoIndex
+from modules.shadow_scorer import ShadowScorer
 
 import joblib
-from typing import Dict, List
+from typing import Dict, List, Tuple
+from sklearn.linear_model import LogisticRegression
 import numpy as np
 import pandas as pd
 import json
 import os
+import time
+
+DEFAULT_THRESHOLD = 0.5
+
+def raw_score(model, features: np.array) -> np.array:
+    # Uncalibrated fraud score: class probability or margin (e.g. SVC without probability=True)
+    if hasattr(model, 'predict_proba'):
+        return model.predict_proba(features)[:, 1]
+    return model.decision_function(features)
+
+def fit_calibrator(raw_scores: np.array, y_true) -> LogisticRegression:
+    # Platt scaling: a one-feature, effectively unregularized logistic regression
+    # from the raw score to the fraud probability, fit on held-out data
+    calibrator = LogisticRegression(C=1e4)
+    calibrator.fit(np.asarray(raw_scores).reshape(-1, 1), np.asarray(y_true).ravel())
+    return calibrator
+
+def score_model(model, features: np.array, calibrator: LogisticRegression = None) -> np.array:
+    scores = raw_score(model, features)
+    if calibrator is not None:
+        return calibrator.predict_proba(scores.reshape(-1, 1))[:, 1]
+
+    # Artifacts trained before calibration was stored: keep scores on [0, 1] at least
+    if not hasattr(model, 'predict_proba'):
+        return 1 / (1 + np.exp(-scores))
+    return scores
+
 class Pipeline:
-    def __init__(self, version: str = None):
+    def __init__(self, version: str = None, shared: bool = False):
+        # In shared mode the model is memory-mapped and the active version is
+        # read from the shared store, so forked workers all serve the same model
+        self.shared = shared
+        self.store = SharedStore() if shared else None
+        self.active_stamp = None
+        self.threshold_stamp = None
+        self.challengers_stamp = None
+        if shared:
+            self.threshold_stamp = self.store.stamp('thresholds')
+            if version:
+                self.check_model(version, self.load_model(version))
+                self.active_stamp = self.store.set_active_model(version)
+            else:
+                self.active_stamp = self.store.active_model_stamp()
+                version = self.store.active_model()
+
         self.version = version
+        self.threshold = DEFAULT_THRESHOLD
+        self.calibrator = None
+        self.state = None
         if version:
             self.model = self.load_model(version)
+            self.calibrator = self.load_calibrator(version)
+            self.state = self.load_state(version)
+            self.threshold = self.load_threshold(version)
         self.history = {}
+
+        # Workers publish their shadow results so any of them can report on all traffic
+        publish = (lambda snapshot: self.store.publish_snapshot('shadow', snapshot)) if shared else None
+        self.shadow = ShadowScorer(score_model, self.transform_features, publish=publish)
+        self.sync_challengers()
         self.prepare_data()
 
     def prepare_data(self):
+        catalog = DatasetCatalog()
+        paths = catalog.source_paths(DEFAULT_VERSION)
+
         raw_data_handler = Raw_Data_Handler()
         raw_data_handler.extract(
-            customer_information_filename = "data_sources/customer_release.csv", 
-            transaction_filename="data_sources/transactions_release.parquet", 
-            fraud_information_filename="data_sources/fraud_release.json")
+            customer_information_filename = paths['customers'], 
+            transaction_filename=paths['transactions'], 
+            fraud_information_filename=paths['fraud'])
+        catalog.register_sources(DEFAULT_VERSION, {
+            'customers': raw_data_handler.customer_data,
+            'transactions': raw_data_handler.transaction_data,
+            'fraud': raw_data_handler.fraud_data
+        }, paths)
         raw_data_handler.transform()
-        raw_data_handler.load('v1.0')
+        self.load_geo_index(raw_data_handler.customer_data, raw_data_handler.raw_data)
+        raw_path = raw_data_handler.load(DEFAULT_VERSION)
+        catalog.record_stage(DEFAULT_VERSION, 'raw_data', raw_data_handler.describe(DEFAULT_VERSION), [raw_path])
 
         dataset_designer = Dataset_Designer()
-        dataset_designer.extract('v1.0')
+        dataset_designer.extract(DEFAULT_VERSION)
         dataset_designer.sample()
-        dataset_designer.load('v1.0')
+        partition_paths = dataset_designer.load(DEFAULT_VERSION)
+        catalog.record_stage(DEFAULT_VERSION, 'partitioned_data', dataset_designer.describe(DEFAULT_VERSION), partition_paths)
 
         feature_extractor = Feature_Extractor()
-        feature_extractor.extract('v1.0_train', 'v1.0_test')
+        feature_extractor.extract(f'{DEFAULT_VERSION}_train', f'{DEFAULT_VERSION}_test')
         feature_extractor.transform()
-        feature_extractor.load('v1.0')
+        feature_paths = feature_extractor.load(DEFAULT_VERSION)
+        catalog.record_stage(DEFAULT_VERSION, 'features', feature_extractor.describe(DEFAULT_VERSION), feature_paths)
+
+    def load_geo_index(self, customer_data: pd.DataFrame, raw_data: pd.DataFrame) -> None:
+        self.geo = GeoIndex.build(customer_data, raw_data)
+
+        # Workers attach to the memory-mapped tables instead of keeping private copies.
+        # The live location history is a writable shared table, so a card's features
+        # don't depend on which worker served its previous transaction.
+        if self.shared:
+            table = f"geo-{time.time_ns()}"
+            self.store.publish_arrays(table, self.geo.arrays())
+            self.store.remove_stale_tables('geo', table)
+            live_table = f"geo-live-{time.time_ns()}"
+            self.store.publish_arrays(live_table, GeoIndex.empty_live())
+            self.store.remove_stale_tables('geo-live', live_table)
+            self.geo = GeoIndex(self.store.attach_arrays(table), self.store.attach_arrays(live_table, mode='r+'),
+                                lock=lambda: self.store.locked('geo-live'))
 
     def load_model(self, version: str):
         model_path = f"storage/models/artifacts/{version}.joblib"
         if os.path.exists(model_path):
+            if self.shared:
+                return self.store.load_model(model_path)
             return joblib.load(model_path)
         return None
 
-    def predict(self, input_data: Dict) -> bool:
-        features = self.preprocess(input_data)
+    def load_calibrator(self, version: str) -> LogisticRegression:
+        calibrator_path = f"storage/models/artifacts/{version}_calibration.joblib"
+        if os.path.exists(calibrator_path):
+            return joblib.load(calibrator_path)
+        return None
+
+    def load_state(self, version: str) -> Dict:
+        # Imputers and scaler fitted (and incrementally updated) with the model
+        state_path = f"storage/models/artifacts/{version}_state.joblib"
+        if os.path.exists(state_path):
+            return joblib.load(state_path)
+        return None
+
+    def load_threshold(self, version: str) -> float:
+        threshold_path = f"storage/models/artifacts/{version}_threshold.json"
+        if os.path.exists(threshold_path):
+            with open(threshold_path, 'r') as f:
+                return json.load(f)['threshold']
+        return DEFAULT_THRESHOLD
+
+    def save_threshold(self, operating_point: Dict, version: str = None) -> None:
+        # The version is the one the operating point was tuned for, which may
+        # no longer be the active one
+        self.sync_model()
+        version = version or self.version
+        threshold_path = f"storage/models/artifacts/{version}_threshold.json"
+        with open(threshold_path, 'w') as f:
+            json.dump(operating_point, f, indent=4)
+        if version == self.version:
+            self.threshold = operating_point['threshold']
+
+        # Make the other workers reload their threshold, without touching the active model
+        if self.shared:
+            self.threshold_stamp = self.store.bump('thresholds')
+
+    def score(self, features: pd.DataFrame) -> np.array:
+        # Unscaled features, prepared with the active model's own saved state
+        self.sync_model()
+        return score_model(self.model, self.transform_features(features, self.state), self.calibrator)
+
+    def predict_with_score(self, input_data: Dict) -> Tuple[bool, float]:
+        self.sync_model()
+        raw_features = self.extract_features(input_data)
+
+        # Latency covers preprocessing and scoring, the same steps timed for challengers
+        start = time.perf_counter()
+        features = self.transform_features(raw_features, self.state)
+        score = float(score_model(self.model, features, self.calibrator)[0])
+        latency_ms = (time.perf_counter() - start) * 1000
+        prediction = score >= self.threshold
+
+        cc_num, lat, long = self.location(input_data)
+        if cc_num is not None:
+            self.geo.observe(cc_num, lat, long)
+
+        input_data_key = self.transaction_key(input_data)
+        self.history[input_data_key] = prediction
+        self.shadow.submit(input_data_key, raw_features, self.version, score, prediction, latency_ms)
 
-        prediction = self.model.predict(features)[0]
+        return prediction, score
 
-        input_data_key = json.dumps(input_data, sort_keys=True)
-        self.history[input_data_key] = bool(prediction)
-       
-        return bool(prediction)
+    def predict(self, input_data: Dict) -> bool:
+        prediction, _ = self.predict_with_score(input_data)
+        return prediction
 
     def select_model(self, version: str) -> None:
+        # Checked before anything changes, so a bad name never reaches the shared pointer
+        model = self.load_model(version)
+        self.check_model(version, model)
         self.version = version
-        self.model = self.load_model(version)
+        self.model = model
+        self.calibrator = self.load_calibrator(version)
+        self.state = self.load_state(version)
+        self.threshold = self.load_threshold(version)
+        if self.shared:
+            self.active_stamp = self.store.set_active_model(version)
+
+    def add_challenger(self, version: str) -> None:
+        self.sync_model()
+        self.load_challenger(version)
+
+        # Registered in the shared store, so every worker shadow scores it
+        if self.shared:
+            with self.store.locked('challengers'):
+                versions = self.store.challengers()
+                if version not in versions:
+                    self.store.set_challengers(versions + [version])
+            self.sync_challengers()
+
+    def load_challenger(self, version: str) -> None:
+        model = self.load_model(version)
+        self.check_model(version, model)
+        self.shadow.add_challenger(version, model, self.load_calibrator(version), self.load_state(version),
+                                   self.load_threshold(version))
+
+    @staticmethod
+    def check_model(version: str, model) -> None:
+        if model is None:
+            raise ValueError(f"Model {version} not found")
+        # Catch a model trained on a different feature set before it fails on every request
+        n_features = getattr(model, 'n_features_in_', None)
+        if n_features is not None and n_features != len(Feature_Extractor.features):
+            raise ValueError(f"Model {version} expects {n_features} features, "
+                             f"the pipeline provides {len(Feature_Extractor.features)}")
+
+    def remove_challenger(self, version: str) -> None:
+        if not self.shared:
+            self.shadow.remove_challenger(version)
+            return
+
+        with self.store.locked('challengers'):
+            versions = self.store.challengers()
+            if version not in versions:
+                raise ValueError(f"Model {version} is not a challenger")
+            self.store.set_challengers([name for name in versions if name != version])
+        self.sync_challengers()
+
+    def sync_challengers(self) -> None:
+        # Bring this worker's challengers in line with the shared list
+        if not self.shared:
+            return
+        challengers_stamp = self.store.challengers_stamp()
+        if challengers_stamp == self.challengers_stamp:
+            return
+        self.challengers_stamp = challengers_stamp
+
+        versions = self.store.challengers()
+        current = self.shadow.list_challengers()
+        for version in current:
+            if version not in versions:
+                self.shadow.remove_challenger(version)
+        for version in versions:
+            if version not in current:
+                try:
+                    self.load_challenger(version)
+                except ValueError:
+                    # Artifact removed or incompatible since it was added; skip it
+                    continue
+
+    def shadow_snapshot(self) -> Dict:
+        if not self.shared:
+            return self.shadow.snapshot()
+
+        # Merge with the other workers' latest published results
+        self.sync_model()
+        self.store.publish_snapshot('shadow', self.shadow.snapshot())
+        return ShadowScorer.merge(self.store.gather_snapshots('shadow'))
+
+    def shadow_report(self) -> Dict:
+        return ShadowScorer.summarize(self.shadow_snapshot())
+
+    def shadow_records(self) -> Dict:
+        return self.shadow_snapshot()['records']
+
+    @staticmethod
+    def transaction_key(input_data: Dict) -> str:
+        return json.dumps(input_data, sort_keys=True)
+
+    def sync_model(self) -> None:
+        # Pick up a model switch, threshold change or challenger change made by another worker
+        if not self.shared:
+            return
+        active_stamp = self.store.active_model_stamp()
+        if active_stamp is not None and active_stamp != self.active_stamp:
+            self.active_stamp = active_stamp
+            self.version = self.store.active_model()
+            self.model = self.load_model(self.version)
+            self.calibrator = self.load_calibrator(self.version)
+            self.state = self.load_state(self.version)
+            self.threshold = self.load_threshold(self.version)
+
+        threshold_stamp = self.store.stamp('thresholds')
+        if threshold_stamp != self.threshold_stamp:
+            self.threshold_stamp = threshold_stamp
+            if self.version:
+                self.threshold = self.load_threshold(self.version)
+
+        self.sync_challengers()
 
     def get_history(self) -> Dict:
         return self.history
@@ -65,13 +319,33 @@ class Pipeline:
             predictions.append(prediction)
         return predictions
 
+    def training_data_version(self) -> str:
+        # Dataset the active model last learned from; older states don't record it
+        return self.state.get('data_version') if self.state else None
+
     def get_model_info(self) -> Dict:
+        self.sync_model()
         return {
             "version": self.version,
+            "threshold": self.threshold,
+            "data_version": self.training_data_version(),
             # "feature_importance": self.model.feature_importances_
         }
 
     def preprocess(self, input_data: Dict) -> np.array:
+        return self.transform_features(self.extract_features(input_data), self.state)
+
+    @staticmethod
+    def transform_features(features: pd.DataFrame, state: Dict) -> np.array:
+        # Models saved without a preprocessing state get a zero fill; check_model has
+        # already rejected artifacts built for a different feature set
+        if state is None:
+            return Feature_Extractor.encode(features, None).fillna(0).values
+
+        # Same encoding, imputation and scaling the model was trained with
+        return state['scaler'].transform(Feature_Extractor.impute(features, state))
+
+    def extract_features(self, input_data: Dict) -> pd.DataFrame:
         df = pd.DataFrame([input_data])
         print(df.columns)
         # Extract transaction time
@@ -88,21 +362,36 @@ class Pipeline:
         # Transaction amount features
         df['log_amt'] = np.log1p(df['amt'])
         
-        # Merchant category features
-        df['category'] = pd.Categorical(df['category']).codes
-        df['merchant'] = pd.Categorical(df['merchant']).codes
+        # Merchant category features stay raw; transform_features encodes them with the model's vocabularies
         
-        # We can't calculate rapid_transactions for a single transaction
-        df['rapid_transactions'] = -1
+        # We can't calculate rapid_transactions for a single transaction; missing values
+        # are left as NaN and imputed like a card's first transaction in training
+        df['rapid_transactions'] = np.nan
         
-        # We can't calculate distance without customer's location
-        df['distance'] = 0
+        # Location features; unknown cards or locations are missing, as in training
+        cc_num, lat, long = self.location(input_data)
+        distance, prev_distance, unusual_region = None, None, True
+        if cc_num is not None:
+            distance = self.geo.distance_from_home(cc_num, lat, long)
+            prev_distance = self.geo.distance_from_previous(cc_num, lat, long)
+            unusual_region = self.geo.is_unusual_region(cc_num, lat, long)
+        df['distance'] = distance if distance is not None else np.nan
+        df['prev_distance'] = prev_distance if prev_distance is not None else np.nan
+        df['unusual_region'] = int(unusual_region)
         
         # Select final features to match the model's
-        features = ['category', 'merchant', 'merch_lat', 'merch_long', 'hour_sin', 'hour_cos', 
-                    'log_amt', 'rapid_transactions', 'distance']
-        
-        return df[features].values
+        features = df[Feature_Extractor.features].copy()
+        numerical_features = Feature_Extractor.numerical_features
+        features[numerical_features] = features[numerical_features].astype(float)
+        return features
+
+    @staticmethod
+    def location(input_data: Dict) -> Tuple[int, float, float]:
+        try:
+            cc_num = int(input_data['cc_num'])
+        except (KeyError, TypeError, ValueError):
+            cc_num = None
+        return cc_num, float(input_data['merch_lat']), float(input_data['merch_long'])
 
 if __name__ == "__main__":
     pipeline = Pipeline('random_forest')
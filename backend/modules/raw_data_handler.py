@@ -3,6 +3,8 @@ import pyarrow.parquet as pq
 import json
 import os
 from typing import Dict, Tuple
+from modules.dataset_catalog import DEFAULT_VERSION
+from modules.geo_index import region_cell
 
 class Raw_Data_Handler:
     def __init__(self):
@@ -61,14 +63,21 @@ class Raw_Data_Handler:
         # Set index to trans_num and sort by trans_date_trans_time
         merged_data.set_index('trans_num', inplace=True)
         merged_data.sort_values('trans_date_trans_time', inplace=True)
+
+        # Location history over the whole timeline, so later partitions see a card's earlier transactions
+        by_card = merged_data.groupby('cc_num')
+        merged_data['prev_merch_lat'] = by_card['merch_lat'].shift()
+        merged_data['prev_merch_long'] = by_card['merch_long'].shift()
+        region = region_cell(merged_data['merch_lat'], merged_data['merch_long'])
+        merged_data['unusual_region'] = (merged_data.groupby(['cc_num', region]).cumcount() == 0).astype(int)
     
         self.raw_data = merged_data
 
         return merged_data
     
-    def describe(self) -> Dict:
+    def describe(self, version: str = DEFAULT_VERSION) -> Dict:
         description = {
-            'version': 'v1.0',
+            'version': version,
             'storage': 'securebank/storage/raw_data/',
             'description': {
                 'shape': self.raw_data.shape,
@@ -80,13 +89,15 @@ class Raw_Data_Handler:
         }
         return description
 
-    def load(self, output_filename: str) -> None:
+    def load(self, output_filename: str) -> str:
         current_dir = os.getcwd()
         save_to_dir = os.path.join(os.path.dirname(current_dir), 'storage/raw_data')
         output_path = os.path.join(save_to_dir, output_filename)
         
         self.raw_data.to_parquet(output_path)
 
+        return output_path
+
     def parse_date(self, date_str):
         for fmt in ("%d/%m/%Y", "%m/%d/%Y", "%B %d, %Y"):
             try:
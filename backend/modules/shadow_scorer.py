@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+class ShadowScorer:
+    def __init__(self, score_model: Callable, transform_features: Callable, max_workers: int = 1,
+                 max_records: int = 10000, latency_window: int = 1000, publish: Callable = None,
+                 publish_interval: float = 1.0):
+        self.score_model = score_model
+        self.transform_features = transform_features
+        self.max_records = max_records
+        self.latency_window = latency_window
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.challengers = {}
+        self.records = OrderedDict()
+        self.stats = {}
+
+        # Records are replaced rather than mutated, so the keys changed since the last
+        # snapshot are all a snapshot needs to copy under the lock; the snapshot's own
+        # copy of the records is brought up to date outside it
+        self.changed = OrderedDict()
+        self.snapshot_lock = threading.Lock()
+        self.snapshot_records = OrderedDict()
+
+        # Optional sink for snapshots of this process's results, e.g. so forked
+        # workers can read each other's; started lazily in the serving process
+        self.publish = publish
+        self.publish_interval = publish_interval
+        self.publisher_pid = None
+        self.dirty = False
+
+    def add_challenger(self, name: str, model, calibrator, state: Dict, threshold: float) -> None:
+        with self.lock:
+            self.challengers[name] = (model, calibrator, state, threshold)
+
+    def remove_challenger(self, name: str) -> None:
+        with self.lock:
+            if name not in self.challengers:
+                raise ValueError(f"Model {name} is not a challenger")
+            del self.challengers[name]
+
+    def list_challengers(self) -> List[str]:
+        with self.lock:
+            return list(self.challengers.keys())
+
+    def submit(self, key: str, features: pd.DataFrame, champion: str, score: float, prediction: bool,
+               latency_ms: float) -> None:
+        with self.lock:
+            challengers = dict(self.challengers)
+            self.records[key] = {
+                'champion': champion,
+                'scores': {champion: {'score': score, 'prediction': prediction, 'latency_ms': latency_ms}}
+            }
+            self.changed[key] = self.records[key]
+            # Oldest records drop off once the window is full
+            while len(self.records) > self.max_records:
+                self.records.popitem(last=False)
+            while len(self.changed) > self.max_records:
+                self.changed.popitem(last=False)
+            self.record_stats(champion, prediction, prediction, latency_ms)
+            self.dirty = True
+        self.start_publisher()
+
+        # Challengers score the unscaled features off the response path, each with its own preprocessing
+        if challengers:
+            self.executor.submit(self.score_challengers, key, features, challengers, prediction)
+
+    def score_challengers(self, key: str, features: pd.DataFrame, challengers: Dict, champion_prediction: bool) -> None:
+        results, errors = {}, {}
+        for name, (model, calibrator, state, threshold) in challengers.items():
+            # One failing challenger must not hide the others' results. Timed over the
+            # same steps as the champion: preprocessing and scoring
+            try:
+                start = time.perf_counter()
+                score = float(self.score_model(model, self.transform_features(features, state), calibrator)[0])
+                latency_ms = (time.perf_counter() - start) * 1000
+                results[name] = {'score': score, 'prediction': score >= threshold, 'latency_ms': latency_ms}
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+
+        with self.lock:
+            record = self.records.get(key)
+            if record is not None:
+                self.records[key] = {'champion': record['champion'], 'scores': {**record['scores'], **results}}
+                self.changed[key] = self.records[key]
+            for name, result in results.items():
+                self.record_stats(name, result['prediction'], champion_prediction, result['latency_ms'])
+            for name, error in errors.items():
+                stats = self.get_stats(name)
+                stats['errors'] += 1
+                stats['last_error'] = error
+            self.dirty = True
+
+    def get_stats(self, name: str) -> Dict:
+        return self.stats.setdefault(name, {
+            'count': 0,
+            'agreements': 0,
+            'flagged': 0,
+            'errors': 0,
+            'last_error': None,
+            'latencies': deque(maxlen=self.latency_window)
+        })
+
+    def record_stats(self, name: str, prediction: bool, champion_prediction: bool, latency_ms: float) -> None:
+        stats = self.get_stats(name)
+        stats['count'] += 1
+        stats['agreements'] += int(prediction == champion_prediction)
+        stats['flagged'] += int(prediction)
+        stats['latencies'].append(latency_ms)
+
+    def start_publisher(self) -> None:
+        # Threads don't survive a fork, so each serving process starts its own
+        if self.publish is None or self.publisher_pid == os.getpid():
+            return
+        with self.lock:
+            if self.publisher_pid == os.getpid():
+                return
+            self.publisher_pid = os.getpid()
+        threading.Thread(target=self.run_publisher, daemon=True).start()
+
+    def run_publisher(self) -> None:
+        while True:
+            time.sleep(self.publish_interval)
+            if not self.dirty:
+                continue
+            self.dirty = False
+            try:
+                with self.snapshot_lock:
+                    self.publish(self.update_snapshot())
+            except OSError:
+                self.dirty = True
+
+    def update_snapshot(self) -> Dict:
+        # Called with snapshot_lock held. Only the changed keys and the per-model
+        # stats are copied while submit() may be waiting on the lock
+        with self.lock:
+            changed, self.changed = self.changed, OrderedDict()
+            challengers = list(self.challengers.keys())
+            stats = {name: dict(stats, latencies=list(stats['latencies'])) for name, stats in self.stats.items()}
+
+        for key, record in changed.items():
+            self.snapshot_records[key] = record
+        while len(self.snapshot_records) > self.max_records:
+            self.snapshot_records.popitem(last=False)
+        return {'challengers': challengers, 'records': self.snapshot_records, 'stats': stats}
+
+    def snapshot(self) -> Dict:
+        with self.snapshot_lock:
+            snapshot = self.update_snapshot()
+            return dict(snapshot, records=OrderedDict(snapshot['records']))
+
+    @staticmethod
+    def merge(snapshots: List[Dict]) -> Dict:
+        merged = {'challengers': [], 'records': {}, 'stats': {}}
+        for snapshot in snapshots:
+            merged['challengers'] += [name for name in snapshot['challengers'] if name not in merged['challengers']]
+            for key, record in snapshot['records'].items():
+                merged_record = merged['records'].setdefault(key, {'champion': record['champion'], 'scores': {}})
+                merged_record['scores'].update(record['scores'])
+            for name, stats in snapshot['stats'].items():
+                merged_stats = merged['stats'].setdefault(name, {
+                    'count': 0, 'agreements': 0, 'flagged': 0, 'errors': 0, 'last_error': None, 'latencies': []
+                })
+                for counter in ['count', 'agreements', 'flagged', 'errors']:
+                    merged_stats[counter] += stats[counter]
+                merged_stats['last_error'] = stats['last_error'] or merged_stats['last_error']
+                merged_stats['latencies'] += stats['latencies']
+        return merged
+
+    @staticmethod
+    def summarize(snapshot: Dict) -> Dict:
+        report = {}
+        for name, stats in snapshot['stats'].items():
+            count = stats['count']
+            latencies = np.array(stats['latencies'])
+            report[name] = {
+                'challenger': name in snapshot['challengers'],
+                'count': count,
+                'agreement_rate': stats['agreements'] / count if count else None,
+                'flag_rate': stats['flagged'] / count if count else None,
+                'mean_latency_ms': float(latencies.mean()) if count else None,
+                'p95_latency_ms': float(np.percentile(latencies, 95)) if count else None,
+                'errors': stats['errors'],
+                'last_error': stats['last_error']
+            }
+        return report
+
+    def get_records(self) -> Dict:
+        return self.snapshot()['records']
+
+    def report(self) -> Dict:
+        return self.summarize(self.snapshot())
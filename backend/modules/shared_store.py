@@ -0,0 +1,213 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+def flatten_forest(model: RandomForestClassifier) -> Dict[str, np.ndarray]:
+    # Concatenate every tree's node arrays; child indices are offset into the joint arrays
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+    def children(tree, offset, side):
+        return np.where(side == -1, -1, side + offset)
+
+    value = np.concatenate([tree.value[:, 0, :] for tree in trees])
+    return {
+        'roots': offsets[:-1].astype(np.int64),
+        'left': np.concatenate([children(tree, offset, tree.children_left) for tree, offset in zip(trees, offsets)]),
+        'right': np.concatenate([children(tree, offset, tree.children_right) for tree, offset in zip(trees, offsets)]),
+        'feature': np.concatenate([tree.feature for tree in trees]).astype(np.int64),
+        'threshold': np.concatenate([tree.threshold for tree in trees]),
+        'proba': value / value.sum(axis=1, keepdims=True),
+        'classes': model.classes_,
+        'n_features_in': np.array([model.n_features_in_])
+    }
+
+class SharedForest:
+    # Read-only random forest over flat, memory-mapped node arrays. sklearn's Tree
+    # copies its nodes into private buffers on unpickling, so a memory-mapped
+    # artifact alone would still give every worker its own copy of the trees.
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.roots = arrays['roots']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.proba = arrays['proba']
+        self.classes_ = np.asarray(arrays['classes'])
+        self.n_features_in_ = int(arrays['n_features_in'][0])
+
+    def predict_proba(self, X) -> np.ndarray:
+        # sklearn compares float32 inputs against the split thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.repeat(self.roots[None, :], X.shape[0], axis=0)
+
+        # Walk all trees for all rows at once, one level per iteration
+        while True:
+            left = self.left[node]
+            is_leaf = left == -1
+            if is_leaf.all():
+                break
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(is_leaf, node, np.where(go_left, left, self.right[node]))
+
+        return self.proba[node].mean(axis=1)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+class SharedStore:
+    def __init__(self, store_dir: str = 'storage/shared'):
+        self.store_dir = store_dir
+
+    def load_model(self, model_path: str):
+        # Tables are keyed by artifact name and mtime, so a retrained artifact gets a fresh table
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        table = f"model-{stem}-{os.stat(model_path).st_mtime_ns}"
+        if os.path.isdir(os.path.join(self.store_dir, table)):
+            return SharedForest(self.attach_arrays(table))
+
+        model = joblib.load(model_path, mmap_mode='r')
+        if not isinstance(model, RandomForestClassifier):
+            # Other models' numpy arrays (coefficients, support vectors) are memory-mapped as is
+            return model
+
+        # First worker to need this forest publishes it; the private copy is dropped
+        self.publish_arrays(table, flatten_forest(model))
+        self.remove_stale_tables(f"model-{stem}", table)
+        return SharedForest(self.attach_arrays(table))
+
+    def publish_arrays(self, table: str, arrays: Dict[str, np.ndarray]) -> None:
+        table_dir = os.path.join(self.store_dir, table)
+        if os.path.isdir(table_dir):
+            return
+
+        # Write into a private directory, then rename it into place in one step
+        tmp_dir = f"{table_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for key, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{key}.npy"), np.ascontiguousarray(array))
+        try:
+            os.rename(tmp_dir, table_dir)
+        except OSError:
+            # Another process published the same table first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def attach_arrays(self, table: str, mode: str = 'r') -> Dict[str, np.ndarray]:
+        # mode='r+' maps a table writably; writes are visible to every process that maps it
+        table_dir = os.path.join(self.store_dir, table)
+        return {
+            filename[:-len('.npy')]: np.load(os.path.join(table_dir, filename), mmap_mode=mode)
+            for filename in os.listdir(table_dir)
+            if filename.endswith('.npy')
+        }
+
+    def remove_stale_tables(self, prefix: str, keep: str) -> None:
+        # Unlinking is safe for workers that still map the old files
+        for table in os.listdir(self.store_dir):
+            if table != keep and not table.endswith('.tmp') and table.rsplit('-', 1)[0] == prefix:
+                shutil.rmtree(os.path.join(self.store_dir, table), ignore_errors=True)
+
+    def write_pointer(self, name: str, content: Dict) -> Tuple[int, int]:
+        os.makedirs(self.store_dir, exist_ok=True)
+        pointer_path = os.path.join(self.store_dir, f"{name}.json")
+        tmp_path = f"{pointer_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(content, f)
+        os.replace(tmp_path, pointer_path)
+        return self.stamp(name)
+
+    def read_pointer(self, name: str) -> Dict:
+        pointer_path = os.path.join(self.store_dir, f"{name}.json")
+        if not os.path.exists(pointer_path):
+            return None
+        with open(pointer_path, 'r') as f:
+            return json.load(f)
+
+    def stamp(self, name: str) -> Tuple[int, int]:
+        # A stat is cheap enough to run on every request; each rename brings a
+        # fresh inode, which catches changes within the filesystem's mtime resolution
+        try:
+            stat = os.stat(os.path.join(self.store_dir, f"{name}.json"))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def bump(self, name: str) -> Tuple[int, int]:
+        return self.write_pointer(name, {'updated_at': time.time()})
+
+    def set_active_model(self, version: str) -> Tuple[int, int]:
+        return self.write_pointer('active_model', {'version': version})
+
+    def active_model(self) -> str:
+        pointer = self.read_pointer('active_model')
+        return pointer['version'] if pointer else None
+
+    def active_model_stamp(self) -> Tuple[int, int]:
+        return self.stamp('active_model')
+
+    @contextmanager
+    def locked(self, name: str):
+        # Serializes writers to a pointer or writable table across threads and worker processes
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(os.path.join(self.store_dir, f".{name}.lock"), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def set_challengers(self, versions: List[str]) -> Tuple[int, int]:
+        return self.write_pointer('challengers', {'versions': versions})
+
+    def challengers(self) -> List[str]:
+        pointer = self.read_pointer('challengers')
+        return pointer['versions'] if pointer else []
+
+    def challengers_stamp(self) -> Tuple[int, int]:
+        return self.stamp('challengers')
+
+    def publish_snapshot(self, name: str, snapshot) -> None:
+        # One file per worker process, replaced whole so readers never see a partial write
+        os.makedirs(self.store_dir, exist_ok=True)
+        snapshot_path = os.path.join(self.store_dir, f"{name}-{os.getpid()}.joblib")
+        tmp_path = f"{snapshot_path}.{threading.get_ident()}.tmp"
+        joblib.dump(snapshot, tmp_path)
+        os.replace(tmp_path, snapshot_path)
+
+    def gather_snapshots(self, name: str) -> List:
+        snapshots = []
+        for filename in os.listdir(self.store_dir):
+            if not (filename.startswith(f"{name}-") and filename.endswith('.joblib')):
+                continue
+            snapshot_path = os.path.join(self.store_dir, filename)
+            pid = int(filename[len(name) + 1:-len('.joblib')])
+            try:
+                if self.is_running(pid):
+                    snapshots.append(joblib.load(snapshot_path))
+                else:
+                    # Left behind by a worker that has exited
+                    os.remove(snapshot_path)
+            except FileNotFoundError:
+                # Removed by another reader in the meantime
+                continue
+        return snapshots
+
+    @staticmethod
+    def is_running(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.drift_monitor import DriftMonitor, RunningStats, TopK
+
+def test_running_stats_matches_numpy():
+    values = np.random.RandomState(0).normal(100, 15, size=500)
+    stats = RunningStats()
+    for value in values:
+        stats.update(value)
+
+    assert stats.count == 500
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.variance == pytest.approx(values.var(ddof=1))
+
+def test_running_stats_variance_needs_two_values():
+    stats = RunningStats()
+    stats.update(3.0)
+    assert stats.variance == 0.0
+
+def test_top_k_counts_exactly_below_capacity():
+    top = TopK(3)
+    for key in ['a', 'b', 'a', 'c', 'a', 'b']:
+        top.update(key)
+    assert top.most_common() == [('a', 3), ('b', 2), ('c', 1)]
+
+def test_top_k_keeps_heavy_hitter():
+    top = TopK(2)
+    for key in ['x'] * 50 + [f"rare-{i}" for i in range(20)]:
+        top.update(key)
+
+    # Space-Saving only overestimates, and a key above n/k is never evicted
+    assert len(top.counts) == 2
+    assert top.most_common()[0][0] == 'x'
+    assert top.counts['x'] >= 50
+
+def test_psi_and_ks():
+    expected = np.array([0.25, 0.25, 0.25, 0.25])
+    shifted = np.array([0.1, 0.2, 0.3, 0.4])
+
+    assert DriftMonitor.psi(expected, expected) == pytest.approx(0.0)
+    assert DriftMonitor.psi(expected, shifted) == pytest.approx(np.sum((shifted - expected) * np.log(shifted / expected)))
+    assert DriftMonitor.ks(expected, expected) == pytest.approx(0.0)
+    assert DriftMonitor.ks(expected, shifted) == pytest.approx(0.2)
+
+def test_psi_stays_finite_on_empty_bins():
+    assert np.isfinite(DriftMonitor.psi(np.array([0.5, 0.5, 0.0]), np.array([0.0, 0.5, 0.5])))
+
+def reference_frame():
+    rng = np.random.RandomState(0)
+    return pd.DataFrame({
+        'amt': rng.exponential(50, size=1000),
+        'merch_lat': rng.uniform(30, 45, size=1000),
+        'merch_long': rng.uniform(-120, -70, size=1000),
+        'hour': rng.randint(0, 24, size=1000),
+        'category': rng.choice(['grocery', 'travel'], size=1000),
+        'merchant': rng.choice(['m1', 'm2', 'm3'], size=1000)
+    })
+
+def transaction(category='grocery', merchant='m1', amt=20.0):
+    return {'amt': amt, 'merch_lat': 40.0, 'merch_long': -80.0, 'category': category,
+            'merchant': merchant, 'trans_date_trans_time': '2024-01-01 12:00:00'}
+
+def test_unseen_categories_pool_into_one_bucket():
+    monitor = DriftMonitor()
+    monitor.fit_reference(reference_frame())
+    for merchant in ['m1', 'm2', 'new-1', 'new-2']:
+        monitor.update(transaction(merchant=merchant))
+
+    merchant = monitor.report()['features']['merchant']
+    assert merchant['unseen_ratio'] == pytest.approx(0.5)
+    assert monitor.category_counts['merchant'][None] == 2
+    assert merchant['psi'] > 0
+
+def test_report_compares_with_reference():
+    monitor = DriftMonitor()
+    monitor.fit_reference(reference_frame())
+    for _ in range(100):
+        monitor.update(transaction(amt=5000.0))
+
+    report = monitor.report()
+    assert report['reference_version'] == monitor.version
+    assert report['count'] == 100
+    # Every live amount lands in the top bin
+    assert report['features']['amt']['ks'] == pytest.approx(0.9, abs=0.01)
+    assert report['features']['amt']['psi'] > 1
+
+def test_missing_values_are_counted():
+    monitor = DriftMonitor()
+    monitor.update({'amt': 'n/a', 'category': '', 'trans_date_trans_time': '2024-01-01 12:00:00'})
+    assert monitor.missing['amt'] == 1
+    assert monitor.missing['category'] == 1
+    assert monitor.missing['merch_lat'] == 1
+
+def test_use_reference_keeps_previous_when_partition_missing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monitor = DriftMonitor(version='v1.0')
+    monitor.use_reference('v-missing')
+    assert monitor.version == 'v1.0'
+    assert 'v-missing' in monitor.unavailable
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from modules.geo_index import GeoIndex, LiveCache, haversine_distance
+from modules.shared_store import SharedStore
+
+def geo_index(**kwargs):
+    customers = pd.DataFrame({'cc_num': [2, 1], 'lat': [41.0, 40.0], 'long': [-71.0, -70.0]})
+    transactions = pd.DataFrame({
+        'cc_num': [1, 1, 2],
+        'trans_date_trans_time': pd.to_datetime(['2024-01-02', '2024-01-01', '2024-01-01']),
+        'merch_lat': [40.5, 40.2, 41.0],
+        'merch_long': [-70.0, -70.0, -71.0]
+    })
+    return GeoIndex(GeoIndex.build(customers, transactions).arrays(), **kwargs)
+
+def test_historical_lookups():
+    geo = geo_index()
+
+    assert geo.home(1) == (40.0, -70.0)
+    assert geo.previous_location(1) == (40.5, -70.0)
+    assert geo.home(3) is None
+    assert geo.distance_from_home(1, 40.0, -70.0) == 0.0
+    assert not geo.is_unusual_region(1, 40.9, -69.5)
+    assert geo.is_unusual_region(1, 45.0, -70.0)
+
+def test_observe_updates_live_history():
+    geo = geo_index()
+    geo.observe(1, 45.0, -70.0)
+
+    assert geo.previous_location(1) == (45.0, -70.0)
+    assert not geo.is_unusual_region(1, 45.0, -70.0)
+    assert geo.distance_from_previous(1, 45.0, -70.0) == 0.0
+    assert geo.distance_from_previous(2, 41.0, -70.0) == haversine_distance(41.0, -71.0, 41.0, -70.0)
+
+def test_live_cache_overwrites_colliding_keys():
+    cache = LiveCache(LiveCache.empty('location', 1, 1, 2), 'location', lambda: NoLock())
+    cache.put((1,), (1.0, 2.0))
+    cache.put((2,), (3.0, 4.0))
+
+    # One slot: the newer card replaces the older, which falls back to a miss
+    assert cache.get((1,)) is None
+    assert cache.get((2,)) == (3.0, 4.0)
+
+def test_live_cache_ignores_slot_being_written():
+    cache = LiveCache(LiveCache.empty('location', 4, 1, 2), 'location', lambda: NoLock())
+    cache.put((1,), (1.0, 2.0))
+    cache.seq[cache.slot((1,))] += 1
+
+    assert cache.get((1,)) is None
+
+def test_live_history_is_shared_through_store(tmp_path):
+    store = SharedStore(str(tmp_path))
+    store.publish_arrays('geo-live-1', GeoIndex.empty_live(capacity=64))
+    lock = lambda: store.locked('geo-live')
+    first = geo_index(live_arrays=store.attach_arrays('geo-live-1', mode='r+'), lock=lock)
+    second = geo_index(live_arrays=store.attach_arrays('geo-live-1', mode='r+'), lock=lock)
+
+    first.observe(1, 45.0, -70.0)
+
+    assert second.previous_location(1) == (45.0, -70.0)
+    assert not second.is_unusual_region(1, 45.0, -70.0)
+
+class NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
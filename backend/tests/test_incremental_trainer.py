@@ -0,0 +1,93 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+from modules.feature_extractor import Feature_Extractor
+from modules.incremental_trainer import IncrementalTrainer
+
+def training_data(seed=0, shift=0.0):
+    rng = np.random.RandomState(seed)
+    X = rng.normal(loc=[0, 10, -3, 1], scale=[1, 5, 2, 3], size=(300, 4)) + shift
+    y = (X[:, 0] + 0.1 * X[:, 1] > 1 + shift).astype(int)
+    return X, y
+
+def test_rescale_coefficients_keeps_decision_function():
+    X, y = training_data()
+    scaler = StandardScaler().fit(X)
+    model = SGDClassifier(random_state=0).fit(scaler.transform(X), y)
+    before = model.decision_function(scaler.transform(X))
+
+    old_scaler = copy.deepcopy(scaler)
+    scaler.partial_fit(training_data(seed=1, shift=2.0)[0])
+    IncrementalTrainer.rescale_coefficients(model, old_scaler, scaler)
+
+    np.testing.assert_allclose(model.decision_function(scaler.transform(X)), before, atol=1e-9)
+
+def test_update_model_follows_scaler_for_linear_models():
+    X, y = training_data()
+    state = {'scaler': StandardScaler().fit(X)}
+    model = SGDClassifier(random_state=0).fit(state['scaler'].transform(X), y)
+    old_mean = state['scaler'].mean_.copy()
+
+    delta, y_delta = training_data(seed=1, shift=2.0)
+    IncrementalTrainer().update_model(model, state, delta, y_delta)
+
+    assert not np.allclose(state['scaler'].mean_, old_mean)
+
+@pytest.mark.parametrize('initial_trees, expected', [(25, [30, 30, 30]), (5, [15, 25, 30])])
+def test_update_model_retires_oldest_trees(initial_trees, expected):
+    X, y = training_data()
+    state = {'scaler': StandardScaler().fit(X)}
+    frozen_mean = state['scaler'].mean_.copy()
+    model = RandomForestClassifier(n_estimators=initial_trees, random_state=0).fit(state['scaler'].transform(X), y)
+    trainer = IncrementalTrainer(new_trees=10, max_trees=30)
+
+    sizes = []
+    for _ in expected:
+        newest = model.estimators_[-1]
+        trainer.update_model(model, state, X, y)
+        sizes.append(len(model.estimators_))
+        # Trees are appended, so the last tree before the update survives it
+        assert any(tree is newest for tree in model.estimators_)
+
+    assert sizes == expected
+    assert model.n_estimators == len(model.estimators_)
+    np.testing.assert_array_equal(state['scaler'].mean_, frozen_mean)
+
+def test_update_model_rejects_models_without_incremental_update():
+    X, y = training_data()
+    state = {'scaler': StandardScaler().fit(X)}
+    model = LogisticRegression().fit(state['scaler'].transform(X), y)
+
+    with pytest.raises(ValueError):
+        IncrementalTrainer().update_model(model, state, X, y)
+
+def test_encode_keeps_training_codes():
+    vocabularies = Feature_Extractor.fit_vocabularies(pd.DataFrame({
+        'category': ['travel', 'grocery', 'misc'],
+        'merchant': ['m3', 'm1', 'm2']
+    }))
+    delta = pd.DataFrame({'category': ['misc', 'new'], 'merchant': ['m2', 'm2']})
+
+    encoded = Feature_Extractor.encode(delta, vocabularies)
+
+    assert encoded['category'].tolist() == [1, -1]
+    assert encoded['merchant'].tolist() == [1, 1]
+
+def test_select_delta_includes_new_and_relabeled_transactions():
+    raw_data = pd.DataFrame({
+        'trans_date_trans_time': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-05']),
+        'is_fraud': [1.0, 1.0, 0.0, 0.0]
+    }, index=pd.Index(['seen-fraud', 'late-fraud', 'seen-legit', 'new'], name='trans_num'))
+    state = {'watermark': pd.Timestamp('2024-01-04'), 'fraud_labels': ['seen-fraud']}
+
+    assert IncrementalTrainer.select_delta(raw_data, state).index.tolist() == ['late-fraud', 'new']
+
+    # States saved without labels only pick up new transactions
+    del state['fraud_labels']
+    assert IncrementalTrainer.select_delta(raw_data, state).index.tolist() == ['new']
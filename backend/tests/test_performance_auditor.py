@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from modules.performance_auditor import PerformanceAuditor
+
+y_true = np.array([1, 0, 1, 0, 0])
+y_score = np.array([0.9, 0.8, 0.7, 0.3, 0.3])
+
+def test_threshold_sweep_rates():
+    sweep = PerformanceAuditor.threshold_sweep(y_true, y_score)
+
+    # Tied scores share one threshold; the first threshold flags nothing
+    assert sweep['thresholds'][0] > 0.9
+    np.testing.assert_allclose(sweep['thresholds'][1:], [0.9, 0.8, 0.7, 0.3])
+    np.testing.assert_allclose(sweep['false_positive_rate'], [0, 0, 1 / 3, 1 / 3, 1])
+    np.testing.assert_allclose(sweep['false_negative_rate'], [1, 0.5, 0.5, 0, 0])
+
+def test_threshold_sweep_matches_brute_force():
+    rng = np.random.RandomState(0)
+    labels = rng.randint(0, 2, size=200)
+    scores = np.round(rng.rand(200), 2)
+
+    sweep = PerformanceAuditor.threshold_sweep(labels, scores)
+    for threshold, fpr, fnr in zip(sweep['thresholds'], sweep['false_positive_rate'], sweep['false_negative_rate']):
+        flagged = scores >= threshold
+        assert fpr == pytest.approx(flagged[labels == 0].mean())
+        assert fnr == pytest.approx(1 - flagged[labels == 1].mean())
+
+def test_threshold_sweep_rejects_empty_scores():
+    with pytest.raises(ValueError):
+        PerformanceAuditor.threshold_sweep([], [])
+
+@pytest.mark.parametrize('target_fpr, threshold, fpr, fnr', [
+    (0.0, 0.9, 0.0, 0.5),
+    (0.34, 0.7, 1 / 3, 0.0),
+    (1.0, 0.3, 1.0, 0.0),
+])
+def test_select_threshold(target_fpr, threshold, fpr, fnr):
+    operating_point = PerformanceAuditor.select_threshold(y_true, y_score, target_fpr)
+
+    assert operating_point['threshold'] == pytest.approx(threshold)
+    assert operating_point['false_positive_rate'] == pytest.approx(fpr)
+    assert operating_point['false_negative_rate'] == pytest.approx(fnr)
+    assert operating_point['false_positive_rate'] <= target_fpr
+
+@pytest.mark.parametrize('target_fpr', [-0.1, 1.5, float('nan'), '0.1', True, None])
+def test_select_threshold_rejects_invalid_target(target_fpr):
+    with pytest.raises(ValueError):
+        PerformanceAuditor.select_threshold(y_true, y_score, target_fpr)
+
+@pytest.mark.parametrize('target_fpr', [-0.1, 1.5, float('nan'), '0.1', True, None])
+def test_validate_target_fpr_rejects_invalid_target(target_fpr):
+    with pytest.raises(ValueError):
+        PerformanceAuditor.validate_target_fpr(target_fpr)
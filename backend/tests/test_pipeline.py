@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from modules.feature_extractor import Feature_Extractor
+from modules.pipeline import Pipeline
+
+def fitted_model(n_features):
+    X = np.random.RandomState(0).normal(size=(20, n_features))
+    return LogisticRegression().fit(X, np.arange(20) % 2)
+
+def test_check_model_accepts_matching_features():
+    Pipeline.check_model('model', fitted_model(len(Feature_Extractor.features)))
+
+def test_check_model_rejects_missing_artifact():
+    with pytest.raises(ValueError, match='not found'):
+        Pipeline.check_model('typo', None)
+
+def test_check_model_rejects_other_feature_count():
+    with pytest.raises(ValueError, match='expects 9 features'):
+        Pipeline.check_model('old_model', fitted_model(9))
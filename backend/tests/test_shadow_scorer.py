@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.shadow_scorer import ShadowScorer
+
+class ConstantModel:
+    def __init__(self, score):
+        self.score = score
+
+    def predict_proba(self, features):
+        return np.array([[1 - self.score, self.score]])
+
+def score_model(model, features, calibrator=None):
+    return model.predict_proba(features)[:, 1]
+
+def transform_features(features, state):
+    if state == 'broken':
+        raise ValueError("bad state")
+    return features.values
+
+features = pd.DataFrame({'amt': [1.0]})
+
+def scorer(**kwargs):
+    shadow = ShadowScorer(score_model, transform_features, **kwargs)
+    shadow.add_challenger('high', ConstantModel(0.9), None, None, 0.5)
+    shadow.add_challenger('broken', ConstantModel(0.9), None, 'broken', 0.5)
+    return shadow
+
+def test_challenger_errors_are_counted():
+    shadow = scorer()
+    shadow.submit('k1', features, 'champion', 0.2, False, 1.0)
+    shadow.executor.shutdown(wait=True)
+
+    report = shadow.report()
+    assert report['high']['count'] == 1
+    assert report['high']['agreement_rate'] == 0.0
+    assert report['broken']['count'] == 0
+    assert report['broken']['errors'] == 1
+    assert report['broken']['last_error'] == "ValueError: bad state"
+    assert shadow.get_records()['k1']['scores'].keys() == {'champion', 'high'}
+
+def test_snapshot_follows_changes_and_window():
+    shadow = scorer(max_records=2)
+    shadow.submit('k1', features, 'champion', 0.2, False, 1.0)
+    first = shadow.snapshot()
+    shadow.submit('k2', features, 'champion', 0.2, False, 1.0)
+    shadow.submit('k3', features, 'champion', 0.2, False, 1.0)
+    shadow.executor.shutdown(wait=True)
+
+    # Earlier snapshots are copies; later ones pick up new and updated records only
+    assert list(first['records']) == ['k1']
+    records = shadow.snapshot()['records']
+    assert list(records) == ['k2', 'k3']
+    assert 'high' in records['k3']['scores']
+    assert not shadow.changed
+
+def test_merge_combines_workers():
+    first, second = scorer(), scorer()
+    first.submit('k1', features, 'champion', 0.2, False, 2.0)
+    second.submit('k2', features, 'champion', 0.8, True, 4.0)
+
+    merged = ShadowScorer.merge([first.snapshot(), second.snapshot()])
+    report = ShadowScorer.summarize(merged)
+    assert set(merged['records']) == {'k1', 'k2'}
+    assert report['champion']['count'] == 2
+    assert report['champion']['flag_rate'] == 0.5
+    assert report['champion']['mean_latency_ms'] == pytest.approx(3.0)
+    assert report['high']['challenger']
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from modules.shared_store import SharedForest, SharedStore, flatten_forest
+
+def fitted_forest(**params):
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(400, 6))
+    y = ((X[:, 0] + X[:, 1] ** 2 + rng.normal(scale=0.5, size=400)) > 1).astype(int)
+    return RandomForestClassifier(n_estimators=15, random_state=0, **params).fit(X, y), rng.normal(size=(200, 6))
+
+@pytest.mark.parametrize('params', [{}, {'class_weight': 'balanced'}, {'max_depth': 3}])
+def test_shared_forest_matches_sklearn(params):
+    model, X = fitted_forest(**params)
+    forest = SharedForest(flatten_forest(model))
+
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+    assert forest.n_features_in_ == model.n_features_in_
+
+def test_shared_forest_matches_sklearn_from_memory_mapped_table(tmp_path):
+    model, X = fitted_forest()
+    store = SharedStore(str(tmp_path))
+    store.publish_arrays('model-forest-1', flatten_forest(model))
+
+    arrays = store.attach_arrays('model-forest-1')
+    assert isinstance(arrays['left'], np.memmap)
+    np.testing.assert_allclose(SharedForest(arrays).predict_proba(X), model.predict_proba(X))